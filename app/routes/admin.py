@@ -1,29 +1,148 @@
-from flask import Blueprint, jsonify
-from models import Report, User, Payment
+import io
+import csv
+import json
+import base64
+from datetime import datetime
+from flask import Blueprint, jsonify, request, Response, stream_with_context
+from sqlalchemy import tuple_
+from models import db, Report, User
+from app.services import stats_service
+from app.services.category_cache import cache_stats
+from app.services.db_profiles import reads_from_replica
 
 admin_bp = Blueprint('admin', __name__)
 
 @admin_bp.route('/admin/stats')
+@reads_from_replica
 def get_stats():
-    total_users = User.query.count()
-    total_reports = Report.query.count()
-    paid_reports = Report.query.filter_by(paid=True).count()
-    total_revenue = sum(p.amount for p in Payment.query.all())
-    
-    return jsonify({
-        "total_users": total_users,
-        "total_reports": total_reports,
-        "paid_reports": paid_reports,
-        "total_revenue": total_revenue
-    })
+    # Materialized counters: O(1) regardless of table size.
+    # ?source=live recomputes them with SQL aggregates in one round trip.
+    if request.args.get('source') == 'live':
+        stats = stats_service.live_totals()
+    else:
+        stats = stats_service.get_totals()
 
-@admin_bp.route('/admin/reports')
-def list_reports():
-    reports = Report.query.order_by(Report.created_at.desc()).limit(50).all()
-    return jsonify([{
+    stats["daily"] = stats_service.get_daily(request.args.get('days', 30, type=int))
+    return jsonify(stats)
+
+# Risk levels are fixed score bands (see risk_engine)
+RISK_LEVEL_SCORES = {"Low": (80, 100), "Moderate": (50, 79), "High": (0, 49)}
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH = 1000
+
+def _encode_cursor(created_at, report_id):
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{report_id}".encode()).decode()
+
+def _decode_cursor(cursor):
+    created_at, report_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(created_at), int(report_id)
+
+def _parse_date(value):
+    return datetime.fromisoformat(value) if value else None
+
+def _report_query(args):
+    """
+    Top-level reports joined to their user's email (no per-row lazy loads),
+    filtered by the admin query string and ordered newest first. Per-account
+    child reports are left out, matching the /admin/stats counts.
+    """
+    query = (db.session.query(Report.id, Report.risk_score, Report.paid, Report.created_at, User.email)
+             .join(User, Report.user_id == User.id)
+             .filter(Report.parent_id.is_(None)))
+
+    paid = args.get('paid')
+    if paid is not None:
+        query = query.filter(Report.paid.is_(paid.lower() == 'true'))
+
+    risk_level = args.get('risk_level')
+    if risk_level:
+        if risk_level not in RISK_LEVEL_SCORES:
+            raise ValueError(f"risk_level must be one of: {', '.join(RISK_LEVEL_SCORES)}")
+        low, high = RISK_LEVEL_SCORES[risk_level]
+        query = query.filter(Report.risk_score.between(low, high))
+
+    min_score = args.get('min_score', type=int)
+    if min_score is not None:
+        query = query.filter(Report.risk_score >= min_score)
+    max_score = args.get('max_score', type=int)
+    if max_score is not None:
+        query = query.filter(Report.risk_score <= max_score)
+
+    since = _parse_date(args.get('since'))
+    if since:
+        query = query.filter(Report.created_at >= since)
+    until = _parse_date(args.get('until'))
+    if until:
+        query = query.filter(Report.created_at < until)
+
+    return query.order_by(Report.created_at.desc(), Report.id.desc())
+
+def _seek(query, cursor):
+    # Keyset pagination: seek past the last (created_at, id) seen
+    if cursor:
+        query = query.filter(tuple_(Report.created_at, Report.id) < cursor)
+    return query
+
+def _page(query, cursor, limit):
+    return _seek(query, cursor).limit(limit).all()
+
+def _report_row(r):
+    return {
         "id": r.id,
-        "user": r.user.email,
+        "user": r.email,
         "score": r.risk_score,
         "is_paid": r.paid,
         "created_at": r.created_at.isoformat()
-    } for r in reports])
+    }
+
+def _export(query, fmt):
+    cursor = None
+    if fmt == 'csv':
+        yield "id,user,score,is_paid,created_at\n"
+    while True:
+        rows = _page(query, cursor, EXPORT_BATCH)
+        for r in rows:
+            row = _report_row(r)
+            if fmt == 'csv':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerow(row.values())
+                yield buffer.getvalue()
+            else:
+                yield json.dumps(row) + "\n"
+        if len(rows) < EXPORT_BATCH:
+            break
+        cursor = (rows[-1].created_at, rows[-1].id)
+
+@admin_bp.route('/admin/reports')
+@reads_from_replica
+def list_reports():
+    try:
+        query = _report_query(request.args)
+        cursor = request.args.get('cursor')
+        cursor = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Streaming export of every matching report for large admin pulls
+    fmt = request.args.get('format')
+    if fmt in ('ndjson', 'csv'):
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        return Response(
+            stream_with_context(_export(query, fmt)),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f"attachment; filename=reports.{fmt}"}
+        )
+
+    limit = max(1, min(request.args.get('limit', PAGE_SIZE, type=int), MAX_PAGE_SIZE))
+    rows = _page(query, cursor, limit)
+    next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+
+    return jsonify({
+        "reports": [_report_row(r) for r in rows],
+        "next_cursor": next_cursor
+    })
+
+@admin_bp.route('/admin/cache-stats')
+def get_cache_stats():
+    return jsonify(cache_stats())
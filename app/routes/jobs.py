@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify, Response, stream_with_context
+from models import db, UploadJob
+from app.services.upload_pipeline import job_to_dict
+from app.services.status_events import stream_changes
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = UploadJob.query.get_or_404(job_id)
+    return jsonify(job_to_dict(job))
+
+@jobs_bp.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """
+    Server-sent events: a `job` event with the job status on connect and on
+    every stage change; closes once the job completes or fails.
+    """
+    UploadJob.query.get_or_404(job_id)
+
+    def load():
+        job = db.session.get(UploadJob, job_id)
+        return job_to_dict(job) if job else None
+
+    stream = stream_changes(
+        load,
+        "job",
+        is_final=lambda job: job["status"] in ("completed", "failed")
+    )
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -1,11 +1,16 @@
 import os
+import json
+import logging
 from flask import Blueprint, request, jsonify, redirect, url_for
-from models import db, Report, Payment
-from app.services.stripe_service import create_checkout_session, verify_payment_session
-import stripe
+from models import db, Report
+from app.services.stripe_service import create_checkout_session
+from app.services.stripe_events import record_event, schedule_processing
+from app.services import metrics
 
 payment_bp = Blueprint('payment', __name__)
 
+logger = logging.getLogger("finhealth.stripe")
+
 @payment_bp.route('/create-checkout-session/<int:report_id>', methods=['POST'])
 def create_session(report_id):
     report = Report.query.get_or_404(report_id)
@@ -31,23 +36,12 @@ def stripe_webhook():
         from app.services.stripe_service import construct_event
         event = construct_event(payload, sig_header)
     except Exception as e:
+        logger.warning("Rejected Stripe webhook: %s", e)
+        metrics.errors.inc(component="stripe_webhook")
         return jsonify({"error": str(e)}), 400
 
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        report_id = session.get('metadata', {}).get('report_id')
-        
-        if report_id:
-            report = Report.query.get(report_id)
-            if report and not report.paid: # Added 'and not report.paid'
-                report.paid = True
-                payment = Payment(
-                    report_id=report.id,
-                    stripe_payment_intent_id=session.payment_intent,
-                    amount=session.amount_total / 100,
-                    status="completed"
-                )
-                db.session.add(payment)
-                db.session.commit()
+    # Store and acknowledge; the inbox consumer applies it in the background
+    if record_event(event['id'], event['type'], json.loads(payload)):
+        schedule_processing()
 
     return jsonify({"status": "success"}), 200
@@ -1,28 +1,142 @@
-from flask import Blueprint, jsonify, send_file, request
-from models import Report, Transaction
-from app.services.pdf_service import generate_report_pdf
+import os
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime, timezone
+from flask import Blueprint, jsonify, request, abort, Response, stream_with_context, current_app
+from sqlalchemy import select, update
+from models import db, Report
+from app.services import stats_service, score_distribution
+from app.services.status_events import notify, stream_changes
+from app.services.stripe_verifier import verify_session_async, when_paid
 
 report_bp = Blueprint('report', __name__)
 
+# How long a report read waits on Stripe before answering with the current state
+VERIFY_READ_WAIT = float(os.getenv('STRIPE_VERIFY_READ_WAIT', 0.5))
+
+def _report_state(report_id):
+    """
+    The small, frequently polled part of a report. Deliberately leaves out
+    summary_data so status checks never load the JSON blob.
+    """
+    row = db.session.execute(
+        select(Report.id, Report.paid, Report.risk_score, Report.updated_at, Report.created_at)
+        .where(Report.id == report_id)
+    ).first()
+    if row is None:
+        return None
+    return {
+        "id": row.id,
+        "ready": row.risk_score is not None,
+        "is_paid": bool(row.paid),
+        "score": row.risk_score,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at or row.created_at
+    }
+
+def _validators(state, histogram_version=None):
+    updated_at = state["updated_at"]
+    version = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    etag = f"report-{state['id']}-{version}-{int(state['is_paid'])}"
+    if histogram_version is not None:
+        # The rank moves as other reports come in, without this one changing;
+        # the version is shared, so every worker agrees on the tag
+        etag += f"-h{histogram_version}"
+    last_modified = updated_at.replace(tzinfo=timezone.utc) if updated_at else None
+    return etag, last_modified
+
+def _not_modified(etag, last_modified):
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    since = request.if_modified_since
+    return since is not None and last_modified is not None and last_modified.replace(microsecond=0) <= since
+
+def _mark_paid(report_id):
+    state = _report_state(report_id)
+    # Conditional update so concurrent confirmations count the payment once;
+    # the PDF prints the rank as of payment
+    result = db.session.execute(
+        update(Report)
+        .where(Report.id == report_id, Report.paid.is_not(True))
+        .values(paid=True, updated_at=datetime.utcnow(),
+                percentile=score_distribution.percentiles_for(state["score"], state["created_at"]))
+    )
+    if result.rowcount:
+        stats_service.record(paid_reports=1)
+    db.session.commit()
+    if result.rowcount:
+        notify()
+
+def _settle_later(app, report_id):
+    def settle():
+        with app.app_context():
+            _mark_paid(report_id)
+            db.session.remove()
+    return settle
+
 @report_bp.route('/report/<int:report_id>')
 def get_report(report_id):
-    report = Report.query.get_or_404(report_id)
+    state = _report_state(report_id)
+    if state is None:
+        abort(404)
     
     # Check if payment was just completed (polling fallback)
     session_id = request.args.get('session_id')
-    if session_id and not report.paid:
-        from app.services.stripe_service import verify_payment_session
-        if verify_payment_session(session_id):
-            report.paid = True
-            from models import db
-            db.session.commit()
-
-    return jsonify({
-        "id": report.id,
-        "score": report.risk_score,
-        "is_paid": report.paid,
-        "summary": report.summary_data
-    })
+    if session_id and not state["is_paid"]:
+        future = verify_session_async(session_id, report_id)
+        try:
+            paid = future.result(timeout=VERIFY_READ_WAIT)
+        except FutureTimeout:
+            # Answer now; the shared Stripe call marks the report paid when it
+            # lands and the events stream pushes the change
+            when_paid(session_id, report_id, future, _settle_later(current_app._get_current_object(), report_id))
+            paid = False
+        if paid:
+            _mark_paid(report_id)
+            state = _report_state(report_id)
+
+    # Histograms cached per version: one version read, no aggregate query
+    histogram_version = score_distribution.current_version() if state["ready"] else None
+    percentile = score_distribution.percentiles_for(state["score"], state["created_at"], histogram_version)
+    etag, last_modified = _validators(state, histogram_version)
+    if _not_modified(etag, last_modified):
+        response = Response(status=304)
+    else:
+        report = db.session.get(Report, report_id)
+        response = jsonify({
+            "id": report.id,
+            "score": report.risk_score,
+            "is_paid": report.paid,
+            "percentile": percentile,
+            "account_name": report.account_name,
+            "parent_id": report.parent_id,
+            "summary": report.summary_data
+        })
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Cache, but revalidate on every poll
+    response.cache_control.no_cache = True
+    return response
+
+@report_bp.route('/report/<int:report_id>/events')
+def report_events(report_id):
+    """
+    Server-sent events: a `status` event with readiness and paid state on
+    connect and on every change; closes once the report is paid.
+    """
+    if _report_state(report_id) is None:
+        abort(404)
+
+    stream = stream_changes(
+        lambda: _report_state(report_id),
+        "status",
+        is_final=lambda state: state["is_paid"]
+    )
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 @report_bp.route('/report/<int:report_id>/download')
 def download_report(report_id):
@@ -30,12 +144,55 @@ def download_report(report_id):
     
     if not report.paid:
         return jsonify({"error": "Payment required"}), 402
-    
-    transactions = Transaction.query.filter_by(report_id=report.id).all()
-    pdf_path = generate_report_pdf(report, transactions)
-    
-    return send_file(
-        pdf_path,
-        as_attachment=True,
-        download_name=f"Financial_Report_{report.id}.pdf"
-    )
+
+    # Loaded on first download: reportlab stays out of worker startup
+    from app.services.pdf_cache import get_cached_pdf, build_pdf
+    from app.services.artifact_store import get_store
+
+    # Served from the artifact store, which any node may have written; on a
+    # miss the freshly rendered bytes are served straight from memory
+    store = get_store()
+    cached = get_cached_pdf(report)
+    if cached is not None:
+        key, size = cached
+        try:
+            return _send_artifact(key, size, lambda start, end: store.stream(key, start, end),
+                                  f"Financial_Report_{report.id}.pdf")
+        except FileNotFoundError:
+            # Evicted between the size lookup and the read
+            pass
+
+    key, data = build_pdf(report)
+    return _send_artifact(key, len(data), lambda start, end: [data[start:end]],
+                          f"Financial_Report_{report.id}.pdf")
+
+def _send_artifact(key, size, open_range, download_name):
+    """
+    Streams a stored artifact with range support. The key is content-
+    addressed, so it doubles as a strong ETag. `open_range(start, end)`
+    returns an iterable of byte chunks.
+    """
+    if request.if_none_match.contains(key):
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
+
+    start, end, status = 0, size, 200
+    byte_range = request.range
+    # If-Range with another version (or a date) gets the whole file
+    if byte_range is not None and request.if_range.etag in (None, key) and request.if_range.date is None:
+        if len(byte_range.ranges) == 1:
+            bounds = byte_range.range_for_length(size)
+            if bounds is None:
+                return Response(status=416, headers={'Content-Range': f"bytes */{size}"})
+            (start, end), status = bounds, 206
+
+    response = Response(open_range(start, end), status=status, mimetype='application/pdf', direct_passthrough=True)
+    response.content_length = end - start
+    if status == 206:
+        response.content_range = f"bytes {start}-{end - 1}/{size}"
+    response.accept_ranges = 'bytes'
+    response.set_etag(key)
+    response.cache_control.private = True
+    response.headers.set('Content-Disposition', 'attachment', filename=download_name)
+    return response
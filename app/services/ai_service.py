@@ -1,8 +1,44 @@
 import os
 import json
-from openai import OpenAI
+import time
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.services import category_cache, rule_categorizer, metrics
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_BATCH_SIZE = int(os.getenv("LLM_BATCH_SIZE", 100))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 4))
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", 5)) # requests per second
+LLM_BURST = int(os.getenv("LLM_BURST", 10))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+LLM_BACKOFF = float(os.getenv("LLM_BACKOFF", 0.5)) # seconds, doubled per retry
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 30)) # seconds per batch
+
+logger = logging.getLogger("finhealth.llm")
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """
+    The OpenAI client, built on first use so importing this module stays
+    cheap. OPENAI_BASE_URL points it at a proxy or a local stub server.
+    Retries are handled per batch below, so the SDK's own are disabled.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    base_url=os.getenv("OPENAI_BASE_URL") or None,
+                    timeout=LLM_TIMEOUT,
+                    max_retries=0
+                )
+    return _client
 
 CATEGORIES = [
     "Groceries", "Rent/Mortgage", "Utilities", "Entertainment", 
@@ -15,33 +51,140 @@ def categorize_transactions(transactions_list):
     transactions_list: list of dicts with 'description' and 'amount'
     Returns: list of categorized transactions
     """
+    categories = categorize_descriptions([tx['description'] for tx in transactions_list])
+    for tx, category in zip(transactions_list, categories):
+        tx['category'] = category
+    return transactions_list
+
+def categorize_descriptions(descriptions):
+    """
+    descriptions: list of transaction description strings
+    Returns: list of categories in the same order as the input
+
+    Confident keyword rules are applied locally first. The rest are
+    normalized and deduplicated, and only keys missing from the
+    categorization cache are sent to the LLM. Weaker rule matches are used
+    when the LLM has no answer (e.g. no OPENAI_API_KEY).
+    """
+    unique_descriptions = list(dict.fromkeys(descriptions))
+    rule_categories, confidences = rule_categorizer.categorize(unique_descriptions)
+
+    resolved = {}
+    fallback = {}
+    leftovers = []
+    for description, category, confidence in zip(unique_descriptions, rule_categories, confidences):
+        if category is not None and confidence >= rule_categorizer.MIN_CONFIDENCE:
+            resolved[description] = category
+        else:
+            leftovers.append(description)
+            if category is not None:
+                fallback[description] = category
+
+    if leftovers:
+        keys_by_description = {d: category_cache.normalize_description(d) for d in leftovers}
+
+        # First raw description seen for each key is what the LLM gets to read
+        representatives = {}
+        for description, key in keys_by_description.items():
+            representatives.setdefault(key, description)
+
+        known = category_cache.get_many(list(representatives))
+        misses = [key for key in representatives if key not in known]
+
+        if misses:
+            fetched = _request_categories([representatives[key] for key in misses])
+            learned = {key: category for key, category in zip(misses, fetched) if category}
+            category_cache.set_many(learned)
+            known.update(learned)
+
+        for description, key in keys_by_description.items():
+            resolved[description] = known.get(key) or fallback.get(description, "Misc")
+
+    return [resolved[d] for d in descriptions]
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second with bursts of up to
+    `capacity`. acquire() blocks until a token is available.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+rate_limiter = TokenBucket(LLM_RATE_LIMIT, LLM_BURST)
+
+def _request_categories(descriptions):
+    """
+    Asks the LLM for one category per description. Entries are None where no
+    usable category came back, so fallbacks never end up in the cache.
+
+    Descriptions are split into LLM_BATCH_SIZE batches sent concurrently;
+    results are reassembled in input order.
+    """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key or "your_openai_api_key" in api_key:
         # Fallback for development without API key
-        return [{"category": "Misc", **tx} for tx in transactions_list]
+        return [None] * len(descriptions)
 
+    batches = [descriptions[i:i + LLM_BATCH_SIZE] for i in range(0, len(descriptions), LLM_BATCH_SIZE)]
+    if len(batches) == 1:
+        return _categorize_batch(batches[0])
+
+    with ThreadPoolExecutor(max_workers=min(LLM_CONCURRENCY, len(batches))) as executor:
+        results = executor.map(_categorize_batch, batches)
+        return [category for batch in results for category in batch]
+
+def _categorize_batch(batch):
+    """
+    One rate-limited LLM call with bounded retries and exponential backoff.
+    """
+    numbered = "\n".join(f"{i + 1}. {description}" for i, description in enumerate(batch))
     prompt = f"""
-    Categorize the following bank transactions into one of these categories: {', '.join(CATEGORIES)}.
-    Format the output as a JSON list of strings (categories only) in the same order as the input.
-    Input: {[tx['description'] for tx in transactions_list]}
-    """
-
-    try:
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={ "type": "json_object" }
-        )
-        data = json.loads(response.choices[0].message.content)
-        categories = data.get("categories", ["Misc"] * len(transactions_list))
-        
-        for i, tx in enumerate(transactions_list):
-            tx['category'] = categories[i] if i < len(categories) else "Misc"
-        
-        return transactions_list
-    except Exception as e:
-        print(f"AI categorization error: {e}")
-        # Fallback
-        for tx in transactions_list:
-            tx['category'] = "Misc"
-        return transactions_list
+    Categorize the following {len(batch)} bank transactions into one of these categories: {', '.join(CATEGORIES)}.
+    Respond with a JSON object of the form {{"categories": [...]}} holding exactly one category per transaction, in the same order as the input.
+    Input:
+    {numbered}
+    """
+
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        rate_limiter.acquire()
+        try:
+            with metrics.external_call(metrics.llm_duration, metrics.llm_requests):
+                response = get_client().chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={ "type": "json_object" },
+                    timeout=LLM_TIMEOUT
+                )
+            if response.usage is not None:
+                metrics.llm_tokens.inc(response.usage.prompt_tokens or 0, kind="prompt")
+                metrics.llm_tokens.inc(response.usage.completion_tokens or 0, kind="completion")
+            data = json.loads(response.choices[0].message.content)
+            categories = data.get("categories", [])
+
+            return [
+                categories[i] if i < len(categories) and categories[i] in CATEGORIES else None
+                for i in range(len(batch))
+            ]
+        except Exception:
+            logger.exception("AI categorization error (attempt %d/%d)", attempt + 1, LLM_MAX_RETRIES + 1)
+            metrics.errors.inc(component="llm_categorize")
+            if attempt < LLM_MAX_RETRIES:
+                time.sleep(LLM_BACKOFF * (2 ** attempt) * (1 + random.random()))
+
+    return [None] * len(batch)
@@ -0,0 +1,385 @@
+"""
+REPORT ARTIFACT STORE
+Where generated artifacts (report PDFs) live, so every web node can serve
+any report without re-rendering it, and artifacts survive restarts of
+ephemeral containers.
+
+Backends are selected with ARTIFACT_BACKEND:
+- local (default): a directory (ARTIFACT_DIR, falling back to
+  PDF_CACHE_DIR) capped at ARTIFACT_MAX_BYTES, least recently read files
+  evicted first. Shared between nodes only on a shared volume.
+- s3: any S3-compatible bucket (optional `boto3` package). ARTIFACT_S3_BUCKET,
+  ARTIFACT_S3_PREFIX, and ARTIFACT_S3_ENDPOINT_URL for MinIO or another
+  stand-in; credentials come from the usual AWS_* variables. Expire old
+  objects with a bucket lifecycle rule.
+
+Every backend streams in both directions (put() reads from a file object,
+stream() yields chunks) and serves byte ranges. Keys are content-addressed
+by their writers, so a key's bytes never change; that makes the in-process
+read-through cache in front of the backend (ARTIFACT_MEMORY_CACHE_BYTES,
+objects up to ARTIFACT_MEMORY_ITEM_BYTES) safe without invalidation
+between nodes.
+"""
+
+import io
+import os
+import abc
+import glob
+import time
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+CHUNK_SIZE = 64 * 1024
+MEMORY_CACHE_BYTES = int(os.getenv('ARTIFACT_MEMORY_CACHE_BYTES', 64 * 1024 * 1024))
+MEMORY_ITEM_BYTES = int(os.getenv('ARTIFACT_MEMORY_ITEM_BYTES', 4 * 1024 * 1024))
+# Eviction trims the local store to this fraction of its cap, so the next
+# few puts don't trigger another directory scan straight away
+EVICT_LOW_WATER = 0.9
+# Other processes sharing the directory aren't in this one's running total
+EVICT_RESCAN_SECONDS = 300
+
+_backends = {}
+_active_store = None
+_store_lock = threading.Lock()
+
+def register_backend(name, factory):
+    """
+    Registers a storage backend factory. The factory takes no arguments
+    (it reads its own settings) and returns an ArtifactStore.
+    """
+    _backends[name] = factory
+
+class ArtifactStore(abc.ABC):
+    """
+    Interface every backend implements. `end` is exclusive, like a slice.
+    Reading a missing key raises FileNotFoundError.
+    """
+    @abc.abstractmethod
+    def size(self, key):
+        """Size in bytes, or None if the key doesn't exist."""
+
+    @abc.abstractmethod
+    def put(self, key, fileobj, content_type='application/octet-stream'):
+        """Stores the remaining contents of `fileobj` under `key`, atomically."""
+
+    @abc.abstractmethod
+    def stream(self, key, start=0, end=None):
+        """Returns an iterator of byte chunks covering [start, end)."""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Removes `key`; a missing key is not an error."""
+
+    @abc.abstractmethod
+    def keys(self, prefix=""):
+        """Sorted keys starting with `prefix`."""
+
+    def put_bytes(self, key, data, content_type='application/octet-stream'):
+        self.put(key, io.BytesIO(data), content_type)
+
+    def read(self, key, start=0, end=None):
+        return b"".join(self.stream(key, start, end))
+
+class LocalArtifactStore(ArtifactStore):
+    """
+    Files under `root`. With `max_bytes`, the least recently read files are
+    evicted once the directory grows past it. Puts and deletes keep a
+    running total, so the directory is only listed when that total crosses
+    the cap, on the first put, or every EVICT_RESCAN_SECONDS to pick up
+    other processes' writes.
+    """
+    def __init__(self, root, max_bytes=None):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._total = None
+        self._scanned_at = 0.0
+        self._evict_lock = threading.Lock()
+
+    def _path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Invalid artifact key: {key}")
+        return path
+
+    def size(self, key):
+        try:
+            return os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, fileobj, content_type='application/octet-stream'):
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Temp file + os.replace: concurrent writers never expose a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".artifact_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                shutil.copyfileobj(fileobj, tmp, CHUNK_SIZE)
+                written = tmp.tell()
+            replaced = self.size(key) or 0
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._track(written - replaced)
+
+    def stream(self, key, start=0, end=None):
+        path = self._path(key)
+        handle = open(path, 'rb')
+        try:
+            # Bump mtime so eviction treats the file as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        handle.seek(start)
+
+        def chunks():
+            with handle:
+                remaining = None if end is None else end - start
+                while remaining is None or remaining > 0:
+                    data = handle.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                    if not data:
+                        break
+                    if remaining is not None:
+                        remaining -= len(data)
+                    yield data
+        return chunks()
+
+    def delete(self, key):
+        path = self._path(key)
+        try:
+            size = os.stat(path).st_size
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._track(-size)
+
+    def keys(self, prefix=""):
+        pattern = os.path.join(self.root, glob.escape(prefix) + "*")
+        return sorted(os.path.relpath(path, self.root) for path in glob.glob(pattern)
+                      if os.path.isfile(path) and not os.path.basename(path).startswith(".artifact_"))
+
+    def _track(self, delta):
+        if not self.max_bytes:
+            return
+        with self._evict_lock:
+            if self._total is not None:
+                self._total += delta
+            stale = time.monotonic() - self._scanned_at >= EVICT_RESCAN_SECONDS
+            if self._total is not None and self._total <= self.max_bytes and not stale:
+                return
+            self._total = self._evict()
+            self._scanned_at = time.monotonic()
+
+    def _evict(self):
+        """
+        Lists the directory, deletes the least recently read files until it
+        is under the low-water mark if it is over the cap, and returns the
+        resulting total.
+        """
+        entries = []
+        for key in self.keys():
+            try:
+                stat = os.stat(self._path(key))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, key))
+
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return total
+        target = self.max_bytes * EVICT_LOW_WATER
+        for _, size, key in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+class S3ArtifactStore(ArtifactStore):
+    def __init__(self, bucket, prefix="", endpoint_url=None, region=None):
+        import boto3
+        from botocore.config import Config
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(
+                retries={"max_attempts": 3, "mode": "standard"},
+                # MinIO and most stand-ins only speak path-style URLs
+                s3={"addressing_style": "path" if endpoint_url else "auto"}
+            )
+        )
+
+    def _key(self, key):
+        return self.prefix + key
+
+    @staticmethod
+    def _is_missing(error):
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def size(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))["ContentLength"]
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+
+    def put(self, key, fileobj, content_type='application/octet-stream'):
+        # Multipart upload in parts for large bodies; nothing is buffered whole
+        self.client.upload_fileobj(fileobj, self.bucket, self._key(key), ExtraArgs={"ContentType": content_type})
+
+    def stream(self, key, start=0, end=None):
+        from botocore.exceptions import ClientError
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or end is not None:
+            params["Range"] = f"bytes={start}-{'' if end is None else end - 1}"
+        try:
+            body = self.client.get_object(**params)["Body"]
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+        def chunks():
+            try:
+                yield from body.iter_chunks(CHUNK_SIZE)
+            finally:
+                body.close()
+        return chunks()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def keys(self, prefix=""):
+        paginator = self.client.get_paginator('list_objects_v2')
+        found = []
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            found.extend(item["Key"][len(self.prefix):] for item in page.get("Contents", []))
+        return sorted(found)
+
+class CachedArtifactStore(ArtifactStore):
+    """
+    In-process read-through cache in front of another store. Objects up to
+    `max_item_bytes` are read whole on first access and then served, ranges
+    included, from memory; larger ones always stream from the backend.
+    """
+    def __init__(self, backend, max_bytes=MEMORY_CACHE_BYTES, max_item_bytes=MEMORY_ITEM_BYTES):
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.max_item_bytes = min(max_item_bytes, max_bytes)
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key):
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return data
+
+    def _remember(self, key, data):
+        if len(data) > self.max_item_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._data[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _forget(self, key):
+        with self._lock:
+            data = self._data.pop(key, None)
+            if data is not None:
+                self._bytes -= len(data)
+
+    def size(self, key):
+        data = self._get(key)
+        return len(data) if data is not None else self.backend.size(key)
+
+    def put(self, key, fileobj, content_type='application/octet-stream'):
+        self._forget(key)
+        self.backend.put(key, fileobj, content_type)
+
+    def put_bytes(self, key, data, content_type='application/octet-stream'):
+        self.backend.put_bytes(key, data, content_type)
+        self._remember(key, bytes(data))
+
+    def stream(self, key, start=0, end=None):
+        data = self._get(key)
+        if data is None:
+            size = self.backend.size(key)
+            if size is None:
+                raise FileNotFoundError(key)
+            with self._lock:
+                self.misses += 1
+            if size > self.max_item_bytes:
+                return self.backend.stream(key, start, end)
+            data = b"".join(self.backend.stream(key))
+            self._remember(key, data)
+        view = memoryview(data)[start:end]
+        return (bytes(view[offset:offset + CHUNK_SIZE]) for offset in range(0, len(view), CHUNK_SIZE))
+
+    def delete(self, key):
+        self._forget(key)
+        self.backend.delete(key)
+
+    def keys(self, prefix=""):
+        return self.backend.keys(prefix)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+def _local_store():
+    root = os.getenv('ARTIFACT_DIR') or os.getenv('PDF_CACHE_DIR', 'static/reports')
+    max_bytes = int(os.getenv('ARTIFACT_MAX_BYTES') or os.getenv('PDF_CACHE_MAX_BYTES', 500 * 1024 * 1024))
+    return LocalArtifactStore(root, max_bytes)
+
+def _s3_store():
+    bucket = os.getenv('ARTIFACT_S3_BUCKET')
+    if not bucket:
+        raise ValueError("ARTIFACT_BACKEND=s3 requires ARTIFACT_S3_BUCKET")
+    return S3ArtifactStore(
+        bucket,
+        prefix=os.getenv('ARTIFACT_S3_PREFIX', 'reports/'),
+        endpoint_url=os.getenv('ARTIFACT_S3_ENDPOINT_URL') or None,
+        region=os.getenv('AWS_REGION') or os.getenv('AWS_DEFAULT_REGION')
+    )
+
+register_backend('local', _local_store)
+register_backend('s3', _s3_store)
+
+def get_store():
+    """
+    The configured store, wrapped in the read-through cache unless
+    ARTIFACT_MEMORY_CACHE_BYTES is 0.
+    """
+    global _active_store
+    with _store_lock:
+        if _active_store is None:
+            name = os.getenv('ARTIFACT_BACKEND', 'local')
+            if name not in _backends:
+                raise ValueError(f"Unknown ARTIFACT_BACKEND: {name}")
+            store = _backends[name]()
+            _active_store = CachedArtifactStore(store) if MEMORY_CACHE_BYTES > 0 else store
+        return _active_store
@@ -0,0 +1,185 @@
+"""
+CATEGORIZATION CACHE
+Remembers LLM categories per normalized merchant description so repeat
+merchants ("NETFLIX", "PAYROLL DEPOSIT") never reach OpenAI twice.
+
+Lookups go through an in-process LRU first, then the `category_cache_entry`
+table. Both honour CATEGORY_CACHE_TTL (seconds); the LRU holds at most
+CATEGORY_CACHE_SIZE keys.
+
+Hit, miss and eviction counts are exported on /metrics, where Prometheus
+sums them across workers. cache_stats() (/admin/cache-stats) reports the
+serving worker's own counts only.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import monotonic
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, CategoryCacheEntry
+from app.services import metrics
+
+CACHE_SIZE = int(os.getenv('CATEGORY_CACHE_SIZE', 50000))
+CACHE_TTL = int(os.getenv('CATEGORY_CACHE_TTL', 90 * 24 * 3600))
+KEY_LENGTH = 255
+QUERY_BATCH = 500
+
+_DATE = re.compile(r'\b\d{1,4}[/-]\d{1,2}(?:[/-]\d{1,4})?\b')
+_REFERENCE = re.compile(r'\b(?:REF|ID|CONF|TRX|TXN|AUTH|SEQ)\b[#:.\s]*\S+')
+_STORE_NUMBER = re.compile(r'(?:#|\bNO\.?\s*|\bSTORE\s*)\d+')
+_DIGIT_TOKEN = re.compile(r'\b\S*\d\S*\b')
+_PUNCTUATION = re.compile(r'[^A-Z&\' ]+')
+_SPACES = re.compile(r'\s+')
+
+def normalize_description(description):
+    """
+    "NETFLIX.COM 12/03 REF#A1B2C3" -> "NETFLIX COM"
+    Strips dates, reference IDs, store numbers and any token containing digits.
+    """
+    text = str(description).upper()
+    text = _DATE.sub(' ', text)
+    text = _REFERENCE.sub(' ', text)
+    text = _STORE_NUMBER.sub(' ', text)
+    text = _DIGIT_TOKEN.sub(' ', text)
+    text = _PUNCTUATION.sub(' ', text)
+    key = _SPACES.sub(' ', text).strip()
+    # Descriptions made only of numbers keep their raw form as the key
+    return (key or str(description).strip().upper())[:KEY_LENGTH]
+
+class LRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            evicted = 0
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+_memory = LRUCache(CACHE_SIZE, CACHE_TTL)
+_stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "evictions": 0}
+_stats_lock = threading.Lock()
+
+_LOOKUP_RESULTS = {"memory_hits": "memory_hit", "db_hits": "db_hit", "misses": "miss"}
+
+def _count(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            _stats[name] += value
+    for name, value in increments.items():
+        if not value:
+            continue
+        if name in _LOOKUP_RESULTS:
+            metrics.category_cache_lookups.inc(value, result=_LOOKUP_RESULTS[name])
+        else:
+            metrics.category_cache_evictions.inc(value)
+
+def cache_stats():
+    """
+    This worker's counts since it started; /metrics has them for every worker.
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+    stats["hit_rate"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+    stats["memory_size"] = len(_memory)
+    stats["scope"] = "worker"
+    stats["pid"] = os.getpid()
+    return stats
+
+def get_many(keys):
+    """
+    Returns {key: category} for every key found in the LRU or the database.
+    """
+    found = {}
+    remaining = []
+    for key in keys:
+        category = _memory.get(key)
+        if category is None:
+            remaining.append(key)
+        else:
+            found[key] = category
+
+    memory_hits = len(found)
+    if remaining:
+        cutoff = datetime.utcnow() - timedelta(seconds=CACHE_TTL)
+        for start in range(0, len(remaining), QUERY_BATCH):
+            batch = remaining[start:start + QUERY_BATCH]
+            rows = (db.session.query(CategoryCacheEntry.key, CategoryCacheEntry.category)
+                    .filter(CategoryCacheEntry.key.in_(batch))
+                    .filter(CategoryCacheEntry.updated_at >= cutoff)
+                    .all())
+            for key, category in rows:
+                found[key] = category
+                _memory.set(key, category)
+
+    _count(
+        memory_hits=memory_hits,
+        db_hits=len(found) - memory_hits,
+        misses=len(keys) - len(found)
+    )
+    return found
+
+def set_many(mapping):
+    """
+    Stores {key: category} in the LRU and upserts it into the database on the
+    current session, so it commits together with the caller's transaction.
+    """
+    if not mapping:
+        return
+    evicted = sum(_memory.set(key, category) for key, category in mapping.items())
+    _count(evictions=evicted)
+
+    now = datetime.utcnow()
+    rows = [{"key": k, "category": c, "updated_at": now} for k, c in mapping.items()]
+    dialect = db.session.connection().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(CategoryCacheEntry.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['key'],
+            set_={"category": stmt.excluded.category, "updated_at": stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            db.session.merge(CategoryCacheEntry(**row))
+
+def prune_expired():
+    """
+    Deletes database entries older than the TTL. Returns the number removed.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=CACHE_TTL)
+    result = db.session.execute(delete(CategoryCacheEntry).where(CategoryCacheEntry.updated_at < cutoff))
+    db.session.commit()
+    return result.rowcount
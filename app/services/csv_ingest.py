@@ -0,0 +1,74 @@
+"""
+STREAMING CSV INGESTION
+Reads uploaded statements in bounded chunks so peak memory stays flat as the
+file grows. Each chunk comes out with vectorized `date` / `amount` columns
+ready for the categorize and persist stages.
+
+The bank layout (column names, date format, sign convention) comes from
+the schema registry in csv_schemas.py.
+"""
+
+import os
+import pandas as pd
+
+DEFAULT_CHUNK_SIZE = int(os.getenv('CSV_CHUNK_SIZE', 20000))
+
+def parse_amounts(values):
+    """
+    Vectorized "$1,234.56" -> 1234.56 and "(12.50)" -> -12.5. Plain numbers
+    skip the string cleanup. Unparseable values become NaN.
+    """
+    amounts = pd.to_numeric(values, errors='coerce').astype('float64')
+    retry = amounts.isna()
+    if retry.any():
+        retry &= values.notna()
+        cleaned = values[retry].astype(str).str.replace(r'[$,\s]', '', regex=True)
+        negative = cleaned.str.startswith('(') & cleaned.str.endswith(')')
+        cleaned = cleaned.str.strip('()')
+        amounts[retry] = pd.to_numeric(cleaned, errors='coerce').where(~negative, lambda v: -v)
+    return amounts
+
+def parse_dates(values, date_format=None):
+    """
+    Vectorized date parsing with the file's format, or (when no format fit
+    the file's sample) one inferred once per chunk. Every row is read the
+    same way: values that don't fit become NaT and are rejected, rather than
+    retried in a format that could read 03/05 as May 3 next to rows read
+    month-first.
+    """
+    return pd.to_datetime(values, errors='coerce', format=date_format)
+
+def normalize_chunk(chunk, schema, date_format=None):
+    """
+    Returns a frame with typed `date`, `description`, `amount` columns and a
+    boolean `valid` column flagging rows that parsed cleanly.
+    """
+    frame = pd.DataFrame({
+        'date': parse_dates(chunk[schema.date_column], date_format),
+        'description': schema.description(chunk),
+        'amount': schema.amount(chunk)
+    })
+    frame['valid'] = frame['date'].notna() & frame['amount'].notna() & frame['description'].notna()
+    # Preamble lines above the header shift the row numbers in the file
+    if schema.header_row:
+        frame.index = frame.index + schema.header_row
+    return frame
+
+def iter_transaction_chunks(path, chunksize=None):
+    """
+    Resolves the file's schema up front (raising ValueError for layouts
+    without date, description and amount columns), then returns a
+    generator of normalized chunks. Only the mapped columns are ever
+    materialized.
+    """
+    from app.services.csv_schemas import compile_schema
+    schema = compile_schema(path)
+    date_format = schema.file_date_format(path)
+    reader = schema.read_csv(path, chunksize or DEFAULT_CHUNK_SIZE)
+
+    def _chunks():
+        with reader:
+            for chunk in reader:
+                yield normalize_chunk(chunk, schema, date_format)
+
+    return _chunks()
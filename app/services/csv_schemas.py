@@ -0,0 +1,304 @@
+"""
+CSV SCHEMA REGISTRY
+Bank exports disagree on almost everything: "Posting Date" vs "Trans.
+Date", one signed Amount vs separate Debit/Credit columns, charges as
+positive numbers on card statements, MM/DD/YYYY vs ISO dates, a few
+preamble lines before the header. A schema maps one layout onto the
+`date` / `description` / `amount` columns the pipeline works with:
+
+    {
+        "name": "chase_checking",
+        "date": "posting date",            # normalized header names
+        "description": ["description"],    # joined with a space if several
+        "amount": "amount",                # or "debit" + "credit"
+        "date_format": "%m/%d/%Y",         # None: sniffed from each file
+        "sign": 1                          # -1 when charges are positive
+    }
+
+A file's schema is looked up by its header signature (a hash of the
+normalized header row):
+
+1. Known signature: the compiled parser is reused from the in-process
+   cache, or rebuilt from the `csv_schema_entry` table.
+2. Built-in bank format: the most specific entry of BUILTIN_FORMATS whose
+   columns all appear in the header.
+3. Anything else: a one-time sniffing pass picks the columns by name.
+
+Resolved schemas are stored under their signature (on the caller's
+session, so they commit with the upload), and later uploads in the same
+layout read with usecols and str dtypes straight away.
+
+Only the built-in bank formats declare a date format. A layout matched by
+its header alone (GENERIC, sniffed) says nothing about day-first vs
+month-first, so every file in it gets its format from a sample of its own
+rows; nothing learned from one customer's file is applied to another's.
+"""
+
+import csv
+import hashlib
+import threading
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, CsvSchemaEntry
+
+# Lines scanned for the header row, for exports with a preamble
+HEADER_SCAN_LINES = 10
+DATE_SAMPLE_ROWS = 200
+# Share of sampled dates a format must parse to be chosen
+DATE_FORMAT_MIN_MATCH = 0.95
+
+# Tried in order, so month-first wins over day-first when both parse
+DATE_FORMATS = [
+    "%Y-%m-%d", "%m/%d/%Y", "%m/%d/%y", "%d/%m/%Y", "%d/%m/%y",
+    "%Y/%m/%d", "%m-%d-%Y", "%d-%m-%Y", "%d.%m.%Y", "%d %b %Y", "%b %d, %Y"
+]
+
+GENERIC = {"name": "generic", "date": "date", "description": ["description"], "amount": "amount"}
+
+# Extra "match" columns only identify the format; they are never read
+BUILTIN_FORMATS = [
+    GENERIC,
+    {"name": "chase_checking", "date": "posting date", "description": ["description"], "amount": "amount",
+     "date_format": "%m/%d/%Y", "match": ["details", "type", "balance"]},
+    {"name": "chase_card", "date": "transaction date", "description": ["description"], "amount": "amount",
+     "date_format": "%m/%d/%Y", "match": ["post date", "category", "type"]},
+    {"name": "bank_of_america", "date": "date", "description": ["description"], "amount": "amount",
+     "date_format": "%m/%d/%Y", "match": ["running bal."]},
+    {"name": "capital_one", "date": "transaction date", "description": ["description"],
+     "debit": "debit", "credit": "credit", "date_format": "%Y-%m-%d", "match": ["posted date", "card no."]},
+    {"name": "citi", "date": "date", "description": ["description"], "debit": "debit", "credit": "credit",
+     "date_format": "%m/%d/%Y", "match": ["status"]},
+    {"name": "amex", "date": "date", "description": ["description"], "amount": "amount",
+     "date_format": "%m/%d/%Y", "sign": -1, "match": ["card member", "account #"]},
+    {"name": "discover", "date": "trans. date", "description": ["description"], "amount": "amount",
+     "date_format": "%m/%d/%Y", "sign": -1, "match": ["post date", "category"]},
+    {"name": "us_bank", "date": "date", "description": ["name"], "amount": "amount",
+     "date_format": "%Y-%m-%d", "match": ["transaction", "memo"]},
+]
+
+# Sniffing synonyms, most preferred first
+DATE_NAMES = ["date", "transaction date", "trans. date", "trans date", "posting date", "posted date",
+              "post date", "value date", "booking date"]
+DESCRIPTION_NAMES = ["description", "merchant", "payee", "name", "details", "narrative", "memo",
+                     "transaction description", "reference"]
+AMOUNT_NAMES = ["amount", "transaction amount", "amount (usd)", "value"]
+DEBIT_NAMES = ["debit", "debit amount", "withdrawal", "withdrawals", "money out", "paid out"]
+CREDIT_NAMES = ["credit", "credit amount", "deposit", "deposits", "money in", "paid in"]
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+def normalize_header(name):
+    return " ".join(str(name).replace("\ufeff", "").split()).lower()
+
+def header_signature(header):
+    normalized = "\x1f".join(normalize_header(name) for name in header)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def spec_columns(spec):
+    columns = [spec["date"], *spec["description"]]
+    if spec.get("amount"):
+        columns.append(spec["amount"])
+    else:
+        columns += [spec["debit"], spec["credit"]]
+    return columns
+
+def _is_header(row):
+    names = {normalize_header(cell) for cell in row}
+    has_amount = names & set(AMOUNT_NAMES) or names & set(DEBIT_NAMES)
+    return bool(names & set(DATE_NAMES) and has_amount)
+
+def read_header(path):
+    """
+    Returns (line index of the header row, header cells). Preamble lines
+    above the header are skipped; without a recognizable header the first
+    line is used and the schema lookup reports the missing columns.
+    """
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as handle:
+        for row in csv.reader(handle):
+            rows.append(row)
+            if _is_header(row) or len(rows) >= HEADER_SCAN_LINES:
+                break
+    if not rows:
+        raise ValueError("CSV file is empty")
+    index = len(rows) - 1 if _is_header(rows[-1]) else 0
+    return index, rows[index]
+
+def match_builtin(names):
+    """
+    The most specific built-in format whose columns are all in `names`.
+    """
+    best = None
+    for spec in BUILTIN_FORMATS:
+        required = set(spec_columns(spec)) | set(spec.get("match", []))
+        if required <= names and (best is None or len(required) > best[0]):
+            best = (len(required), spec)
+    return best[1] if best else None
+
+def _first(names, candidates, exclude=()):
+    for candidate in candidates:
+        if candidate in names and candidate not in exclude:
+            return candidate
+    return None
+
+def sniff_columns(names):
+    """
+    Picks the date, description and amount (or debit/credit) columns by
+    name. Returns a spec without a date format, or None.
+    """
+    date = _first(names, DATE_NAMES)
+    amount = _first(names, AMOUNT_NAMES)
+    debit = _first(names, DEBIT_NAMES)
+    credit = _first(names, CREDIT_NAMES)
+    description = _first(names, DESCRIPTION_NAMES, exclude={date})
+    if not (date and description and (amount or (debit and credit))):
+        return None
+
+    spec = {"name": "sniffed", "date": date, "description": [description]}
+    if amount:
+        spec["amount"] = amount
+    else:
+        spec.update(debit=debit, credit=credit)
+    return spec
+
+def sniff_date_format(values):
+    """
+    The first DATE_FORMATS entry that parses nearly every sampled value, or
+    None to leave the format to pandas' per-chunk inference.
+    """
+    import pandas as pd
+    sample = values.dropna().astype(str).str.strip()
+    sample = sample[sample != ""].head(DATE_SAMPLE_ROWS)
+    if sample.empty:
+        return None
+    for date_format in DATE_FORMATS:
+        parsed = pd.to_datetime(sample, format=date_format, errors="coerce")
+        if parsed.notna().mean() >= DATE_FORMAT_MIN_MATCH:
+            return date_format
+    return None
+
+class CompiledSchema:
+    """
+    A schema bound to one header row: raw column names to read, their
+    dtypes, and how to turn a chunk into date / description / amount.
+    """
+    def __init__(self, spec, header_row, header):
+        self.spec = spec
+        self.name = spec["name"]
+        self.header_row = header_row
+        raw = {}
+        for name in header:
+            raw.setdefault(normalize_header(name), name)
+        self.date_column = raw[spec["date"]]
+        self.description_columns = [raw[name] for name in spec["description"]]
+        self.amount_column = raw.get(spec.get("amount"))
+        self.debit_column = raw.get(spec.get("debit"))
+        self.credit_column = raw.get(spec.get("credit"))
+        # Declared by the bank format; None means sniff it from each file
+        self.date_format = spec.get("date_format")
+        self.sign = spec.get("sign", 1)
+        self.usecols = list(dict.fromkeys(raw[name] for name in spec_columns(spec)))
+        self.dtype = {column: str for column in self.usecols}
+
+    def read_csv(self, path, chunksize):
+        import pandas as pd
+        return pd.read_csv(
+            path,
+            skiprows=self.header_row,
+            usecols=self.usecols,
+            dtype=self.dtype,
+            encoding="utf-8-sig",
+            chunksize=chunksize
+        )
+
+    def file_date_format(self, path):
+        """
+        The date format to read the file at `path` with: the declared one,
+        or the one its own first DATE_SAMPLE_ROWS dates agree on.
+        """
+        if self.date_format is not None:
+            return self.date_format
+        import pandas as pd
+        sample = pd.read_csv(path, skiprows=self.header_row, usecols=[self.date_column], dtype=str,
+                             encoding="utf-8-sig", nrows=DATE_SAMPLE_ROWS)
+        return sniff_date_format(sample[self.date_column])
+
+    def description(self, chunk):
+        columns = [chunk[column].astype("string").str.strip() for column in self.description_columns]
+        if len(columns) == 1:
+            return columns[0]
+        description = columns[0].fillna("")
+        for column in columns[1:]:
+            description = description.str.cat(column.fillna(""), sep=" ")
+        description = description.str.strip()
+        return description.mask(description == "")
+
+    def amount(self, chunk):
+        from app.services.csv_ingest import parse_amounts
+        if self.amount_column is not None:
+            amount = parse_amounts(chunk[self.amount_column])
+        else:
+            # Some exports sign their debits, some don't
+            debit = parse_amounts(chunk[self.debit_column]).abs()
+            credit = parse_amounts(chunk[self.credit_column]).abs()
+            amount = credit.fillna(0) - debit.fillna(0)
+            amount = amount.mask(debit.isna() & credit.isna())
+        return amount * self.sign if self.sign != 1 else amount
+
+def _store(signature, spec):
+    table = CsvSchemaEntry.__table__
+    values = {"signature": signature, "name": spec["name"], "spec": spec, "created_at": datetime.utcnow()}
+    dialect = db.session.connection().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        db.session.execute(insert(table).values(**values).on_conflict_do_nothing(index_elements=["signature"]))
+        return
+    if db.session.get(CsvSchemaEntry, signature) is None:
+        db.session.add(CsvSchemaEntry(**values))
+
+def _load(signature):
+    return db.session.execute(
+        select(CsvSchemaEntry.spec).where(CsvSchemaEntry.signature == signature)
+    ).scalar()
+
+def _resolve(header):
+    """
+    Built-in match or sniffed spec for a header seen for the first time.
+    """
+    names = {normalize_header(name) for name in header}
+    spec = match_builtin(names) or sniff_columns(names)
+    if spec is None:
+        raise ValueError(
+            "CSV must contain date, description and amount (or debit/credit) columns; "
+            f"found: {', '.join(sorted(names))}"
+        )
+    return {key: value for key, value in spec.items() if key != "match"}
+
+def compile_schema(path):
+    """
+    Returns the CompiledSchema for the CSV at `path`, resolving and storing
+    it on first sight of its header. Raises ValueError for unusable layouts.
+    """
+    header_row, header = read_header(path)
+    key = (header_row, tuple(header))
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+    if compiled is not None:
+        return compiled
+
+    signature = header_signature(header)
+    spec = _load(signature)
+    if spec is None:
+        spec = _resolve(header)
+        _store(signature, spec)
+
+    compiled = CompiledSchema(spec, header_row, header)
+    with _compiled_lock:
+        _compiled[key] = compiled
+    return compiled
+
+def clear_cache():
+    with _compiled_lock:
+        _compiled.clear()
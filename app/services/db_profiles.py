@@ -0,0 +1,153 @@
+"""
+DATABASE ENGINE PROFILES
+Engine tuning picked from the database URL (DB_PROFILE=auto), or forced
+with DB_PROFILE=sqlite|postgresql|none:
+
+- sqlite: WAL journal (readers never block the writer and vice versa),
+  busy_timeout so concurrent writers wait for the lock instead of failing
+  with "database is locked", synchronous=NORMAL (durable at checkpoints,
+  safe with WAL) and a memory-mapped read path. Set per connection through
+  a connect-event PRAGMA.
+- postgresql: pool size/overflow/recycle, pre-ping so connections dropped
+  by the server or a proxy are replaced transparently, and a server-side
+  statement_timeout for web requests only. A checkout-event hook sets it
+  when a connection is handed to a request and lifts it for everything
+  else, so migrations, CLI rebuilds and background jobs (no request
+  context) are never cancelled.
+
+Read replica: with DATABASE_REPLICA_URL set, views wrapped in
+@reads_from_replica send their SELECTs to the "replica" bind. The first
+write in a request (or pin_primary()) pins the rest of the request to the
+primary, so a request always reads its own writes. Background jobs and
+undecorated views never touch the replica.
+"""
+
+import os
+import functools
+from flask import g, has_app_context, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA = "replica"
+
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 15000))
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+def profile_for(url):
+    profile = os.getenv('DB_PROFILE', 'auto')
+    if profile != 'auto':
+        return profile
+    if url.startswith('sqlite'):
+        return 'sqlite'
+    if url.startswith('postgres'):
+        return 'postgresql'
+    return 'none'
+
+def engine_options(url):
+    """
+    SQLAlchemy create_engine() keyword arguments for the URL's profile.
+    """
+    profile = profile_for(url)
+    if profile == 'sqlite':
+        # pysqlite's own lock wait; the PRAGMA below sets the same for SQLite
+        return {"connect_args": {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    if profile == 'postgresql':
+        return {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": True
+        }
+    return {}
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    finally:
+        cursor.close()
+
+def _statement_timeout(dbapi_connection, connection_record, connection_proxy):
+    timeout = DB_STATEMENT_TIMEOUT_MS if has_request_context() else 0
+    # Remembered per DBAPI connection, so a reused one costs no round trip
+    if connection_record.info.get('statement_timeout', 0) == timeout:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SET statement_timeout = {int(timeout)}")
+    finally:
+        cursor.close()
+    # Committed so rolling back the caller's transaction can't revert it
+    dbapi_connection.commit()
+    connection_record.info['statement_timeout'] = timeout
+
+def configure(app):
+    """
+    Sets the engine options (and the replica bind) before db.init_app.
+    """
+    url = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(url))
+
+    replica_url = os.getenv('DATABASE_REPLICA_URL')
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {})[REPLICA] = {"url": replica_url, **engine_options(replica_url)}
+
+def attach(app, db):
+    """
+    Installs the SQLite connect-event PRAGMAs and the PostgreSQL request
+    statement_timeout on the app's engines.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            profile = profile_for(str(engine.url))
+            if profile == 'sqlite' and not event.contains(engine, 'connect', _sqlite_pragmas):
+                event.listen(engine, 'connect', _sqlite_pragmas)
+            if (profile == 'postgresql' and DB_STATEMENT_TIMEOUT_MS
+                    and not event.contains(engine, 'checkout', _statement_timeout)):
+                event.listen(engine, 'checkout', _statement_timeout)
+
+def reads_from_replica(view):
+    """
+    Lets a read-only view send its SELECTs to the replica, if one is
+    configured.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_replica_reads = True
+        return view(*args, **kwargs)
+    return wrapper
+
+def pin_primary():
+    """
+    Sends the rest of the current request to the primary.
+    """
+    if has_app_context():
+        g.db_primary_pinned = True
+
+class RoutingSession(Session):
+    """
+    db.session class: plain SELECTs of a @reads_from_replica view go to the
+    replica bind until the request first writes.
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context() and g.get('db_replica_reads') and not g.get('db_primary_pinned'):
+            engines = self._db.engines
+            if REPLICA in engines:
+                if (clause is not None and getattr(clause, 'is_select', False)
+                        and getattr(clause, '_for_update_arg', None) is None and not self._flushing):
+                    return engines[REPLICA]
+                if clause is not None or self._flushing:
+                    # A write: this request reads from the primary from now on
+                    g.db_primary_pinned = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
@@ -0,0 +1,102 @@
+"""
+BACKGROUND JOB QUEUE
+Runs long tasks (upload processing, etc.) off the request thread.
+
+Backends are selected with JOB_BACKEND:
+- thread  (default): local ThreadPoolExecutor, shares the web worker's app.
+- process: local ProcessPoolExecutor, each child builds its own app.
+- rq:      Redis Queue (optional `rq` + `redis` packages, uses REDIS_URL).
+
+Tasks are referenced by dotted path ("module:function") so every backend can
+ship them across a process boundary.
+"""
+
+import os
+import importlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from flask import current_app
+from app.services import metrics
+
+_backends = {}
+_active_backend = None
+_worker_app = None
+
+def register_backend(name, factory):
+    """
+    Registers a queue backend factory. The factory receives the worker count
+    and must return an object exposing `submit(task_path, args, app)`.
+    """
+    _backends[name] = factory
+
+def _resolve(task_path):
+    module_name, func_name = task_path.split(':')
+    return getattr(importlib.import_module(module_name), func_name)
+
+def _get_worker_app():
+    # Out-of-process workers build the app once and reuse it for every task
+    global _worker_app
+    if _worker_app is None:
+        from main import create_app
+        _worker_app = create_app()
+    return _worker_app
+
+def execute_task(task_path, args, app=None):
+    """
+    Entry point used by every backend: runs a task inside an app context.
+    """
+    if app is None:
+        app = _get_worker_app()
+    func = _resolve(task_path)
+    with app.app_context(), metrics.trace(f"job {task_path}", slow_ms=metrics.SLOW_JOB_MS) as trace:
+        try:
+            result = func(*args)
+        except Exception:
+            metrics.jobs.inc(task=task_path, outcome="error")
+            raise
+        finally:
+            metrics.job_duration.observe(trace.elapsed, task=task_path)
+        metrics.jobs.inc(task=task_path, outcome="ok")
+        return result
+
+class ThreadPoolBackend:
+    def __init__(self, workers):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job-worker')
+
+    def submit(self, task_path, args, app):
+        return self.executor.submit(execute_task, task_path, args, app)
+
+class ProcessPoolBackend:
+    def __init__(self, workers):
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(self, task_path, args, app):
+        return self.executor.submit(execute_task, task_path, args)
+
+class RQBackend:
+    def __init__(self, workers):
+        from redis import Redis
+        from rq import Queue
+        connection = Redis.from_url(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+        self.queue = Queue(os.getenv('JOB_QUEUE_NAME', 'uploads'), connection=connection)
+
+    def submit(self, task_path, args, app):
+        return self.queue.enqueue(execute_task, task_path, args)
+
+register_backend('thread', ThreadPoolBackend)
+register_backend('process', ProcessPoolBackend)
+register_backend('rq', RQBackend)
+
+def get_backend():
+    global _active_backend
+    if _active_backend is None:
+        name = os.getenv('JOB_BACKEND', 'thread')
+        if name not in _backends:
+            raise ValueError(f"Unknown JOB_BACKEND: {name}")
+        _active_backend = _backends[name](int(os.getenv('JOB_WORKERS', 4)))
+    return _active_backend
+
+def enqueue(task_path, *args):
+    """
+    Schedules `task_path(*args)` on the configured backend.
+    """
+    return get_backend().submit(task_path, args, current_app._get_current_object())
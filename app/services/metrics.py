@@ -0,0 +1,286 @@
+"""
+INSTRUMENTATION
+In-process counters and histograms rendered in the Prometheus text format
+at /metrics, plus per-request (and per-background-job) traces that break
+the wall time down by stage and SQL for slow-request logging.
+
+- timed("parse") / timed_iter("parse", it): stage timers. They feed the
+  finhealth_stage_duration_seconds histogram and the current trace.
+- SQL statements are counted and timed through SQLAlchemy engine events.
+- Errors that are logged and recovered from (a failed LLM batch, a Stripe
+  call, a webhook event) count in finhealth_errors_total by component.
+- Requests slower than SLOW_REQUEST_MS, and jobs slower than SLOW_JOB_MS,
+  are logged with their stage and SQL breakdown on the "finhealth.slow"
+  logger.
+
+Metrics are per process: with several gunicorn workers, each worker serves
+its own numbers, and Prometheus should scrape (or sum) every worker.
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import request, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', 1000))
+SLOW_JOB_MS = float(os.getenv('SLOW_JOB_MS', 10000))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+slow_log = logging.getLogger("finhealth.slow")
+
+# --- Registry -------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}"]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def _render_sample(self, key, state):
+        lines = []
+        for bound, count in zip(self.buckets, state["counts"]):
+            labels = _format_labels(self.label_names, key, [f'le="{bound}"'])
+            lines.append(f"{self.name}_bucket{labels} {count}")
+        labels = _format_labels(self.label_names, key, ['le="+Inf"'])
+        lines.append(f"{self.name}_bucket{labels} {state['count']}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {state['sum']}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {state['count']}")
+        return lines
+
+_registry = []
+
+def counter(name, documentation, labels=()):
+    metric = Counter(name, documentation, labels)
+    _registry.append(metric)
+    return metric
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    metric = Histogram(name, documentation, labels, buckets)
+    _registry.append(metric)
+    return metric
+
+def render_prometheus():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Metrics --------------------------------------------------------------
+
+http_requests = counter("finhealth_http_requests_total", "HTTP requests handled.", ("method", "endpoint", "status"))
+http_duration = histogram("finhealth_http_request_duration_seconds", "Time to build the HTTP response.", ("method", "endpoint"))
+http_sql_queries = histogram("finhealth_http_request_sql_queries", "SQL statements issued per HTTP request.", ("endpoint",), COUNT_BUCKETS)
+
+stage_duration = histogram("finhealth_stage_duration_seconds", "Time spent per pipeline stage invocation.", ("stage",))
+stage_rows = counter("finhealth_stage_rows_total", "Rows processed per pipeline stage.", ("stage",))
+
+job_duration = histogram("finhealth_job_duration_seconds", "Background task run time.", ("task",))
+jobs = counter("finhealth_jobs_total", "Background tasks run.", ("task", "outcome"))
+
+sql_queries = counter("finhealth_sql_queries_total", "SQL statements executed.")
+sql_duration = histogram("finhealth_sql_query_duration_seconds", "SQL statement execution time.", buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+llm_requests = counter("finhealth_llm_requests_total", "LLM categorization calls.", ("outcome",))
+llm_duration = histogram("finhealth_llm_request_duration_seconds", "LLM categorization call latency.")
+llm_tokens = counter("finhealth_llm_tokens_total", "LLM tokens used.", ("kind",))
+
+stripe_requests = counter("finhealth_stripe_requests_total", "Stripe API calls.", ("operation", "outcome"))
+stripe_duration = histogram("finhealth_stripe_request_duration_seconds", "Stripe API call latency.", ("operation",))
+
+category_cache_lookups = counter("finhealth_category_cache_lookups_total", "Category cache lookups by where they were answered.", ("result",))
+category_cache_evictions = counter("finhealth_category_cache_evictions_total", "Keys evicted from the in-process category LRU.")
+
+errors = counter("finhealth_errors_total", "Errors caught, logged and recovered from.", ("component",))
+
+# --- Traces ---------------------------------------------------------------
+
+_current_trace = ContextVar("finhealth_trace", default=None)
+
+class Trace:
+    """
+    Wall time of one request or job, broken down by stage and SQL.
+    """
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+    def add_stage(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        parts = [f"{self.name} {self.elapsed * 1000:.0f}ms", f"sql={self.sql_count} ({self.sql_seconds * 1000:.0f}ms)"]
+        if self.stages:
+            breakdown = " ".join(f"{stage}={seconds * 1000:.0f}ms" for stage, seconds in
+                                 sorted(self.stages.items(), key=lambda item: -item[1]))
+            parts.append(f"stages: {breakdown}")
+        return " ".join(parts)
+
+@contextmanager
+def trace(name, slow_ms=None):
+    """
+    Collects a breakdown for everything run inside the block. Logs it when
+    the block takes longer than `slow_ms`.
+    """
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+        if slow_ms is not None and current.elapsed * 1000 >= slow_ms:
+            slow_log.warning("slow %s", current.summary())
+
+@contextmanager
+def timed(stage, rows=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage)
+        if rows:
+            stage_rows.inc(rows, stage=stage)
+        current = _current_trace.get()
+        if current is not None:
+            current.add_stage(stage, elapsed)
+
+def timed_iter(stage, iterable):
+    """
+    Times each step of a lazy iterator (e.g. chunked CSV parsing) as `stage`.
+    """
+    iterator = iter(iterable)
+    while True:
+        with timed(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        if hasattr(item, '__len__'):
+            stage_rows.inc(len(item), stage=stage)
+        yield item
+
+@contextmanager
+def external_call(histogram_metric, counter_metric, **labels):
+    """
+    Times a call to an outside service and counts it by outcome.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        counter_metric.inc(outcome="error", **labels)
+        raise
+    else:
+        counter_metric.inc(outcome="ok", **labels)
+    finally:
+        histogram_metric.observe(time.perf_counter() - start, **labels)
+
+# --- Wiring ---------------------------------------------------------------
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("finhealth_query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("finhealth_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    sql_queries.inc()
+    sql_duration.observe(elapsed)
+    current = _current_trace.get()
+    if current is not None:
+        current.sql_count += 1
+        current.sql_seconds += elapsed
+
+def init_app(app):
+    """
+    Traces every request and records the HTTP metrics.
+    """
+    @app.before_request
+    def _start_request_trace():
+        g._metrics_trace = Trace(f"{request.method} {request.path}")
+        _current_trace.set(g._metrics_trace)
+
+    @app.after_request
+    def _finish_request_trace(response):
+        current = g.pop('_metrics_trace', None)
+        if current is None:
+            return response
+        _current_trace.set(None)
+
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        elapsed = current.elapsed
+        http_requests.inc(method=request.method, endpoint=endpoint, status=response.status_code)
+        http_duration.observe(elapsed, method=request.method, endpoint=endpoint)
+        http_sql_queries.observe(current.sql_count, endpoint=endpoint)
+        if elapsed * 1000 >= SLOW_REQUEST_MS:
+            slow_log.warning("slow request %s status=%s", current.summary(), response.status_code)
+        return response
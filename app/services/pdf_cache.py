@@ -0,0 +1,71 @@
+"""
+REPORT PDF CACHE
+PDFs are stored under a content-addressed key,
+report_{id}_{hash(summary_data, risk_score, percentile)}.pdf, so a report
+whose data changes gets a new object and stale versions are never served.
+The percentile is the snapshot stored on the report, not the live rank, so
+every node computes the same key for the same report.
+
+They live in the artifact store (artifact_store.py): a local directory by
+default, or an S3-compatible bucket shared by every web node. Writes are
+atomic in both, so concurrent renders never expose a half-written PDF.
+"""
+
+import json
+import hashlib
+from models import db, Report
+from app.services.pdf_service import report_payload, render_report_in_pool
+from app.services import metrics
+from app.services.artifact_store import get_store
+
+def cache_key(report):
+    payload = json.dumps({
+        "summary": report.summary_data,
+        "score": report.risk_score,
+        # Printed on the PDF; changes only when the report is scored or paid
+        "percentile": report.percentile
+    }, sort_keys=True, default=str)
+    digest = hashlib.sha256(payload.encode()).hexdigest()[:16]
+    return f"report_{report.id}_{digest}.pdf"
+
+def get_cached_pdf(report):
+    """
+    Returns (key, size) of the stored PDF for the report's current data, or
+    None.
+    """
+    key = cache_key(report)
+    size = get_store().size(key)
+    return None if size is None else (key, size)
+
+def build_pdf(report):
+    """
+    Renders the report in the render pool, stores it and returns
+    (key, PDF bytes) so the caller can serve them without a re-read.
+    """
+    # The PDF is built from summary_data; transaction rows aren't needed
+    with metrics.timed("render"):
+        data = render_report_in_pool(report_payload(report))
+
+    key = cache_key(report)
+    store = get_store()
+    store.put_bytes(key, data, content_type='application/pdf')
+    _remove_stale_versions(store, report, key)
+    return key, data
+
+def _remove_stale_versions(store, report, current_key):
+    for key in store.keys(f"report_{report.id}_"):
+        if key != current_key and key.endswith(".pdf"):
+            store.delete(key)
+
+def pregenerate_report_pdf(report_id):
+    """
+    Background task run after payment so the first download is a cache hit.
+    """
+    report = db.session.get(Report, report_id)
+    if report is None or not report.paid:
+        return None
+    cached = get_cached_pdf(report)
+    if cached is None:
+        key, _ = build_pdf(report)
+        return key
+    return cached[0]
@@ -1,4 +1,19 @@
+"""
+PDF RENDERING ENGINE
+Styles are built once per process and reused for every render. Renders take
+a plain, picklable payload (see report_payload) so they can run in a
+ProcessPoolExecutor without holding the GIL against request handling, and
+can target a file path or an in-memory buffer.
+
+PDF_RENDER_WORKERS sets the pool size (default 1, 0 renders inline). Every
+gunicorn worker starts its own pool, so a host runs WEB_CONCURRENCY times
+that many render processes.
+"""
+
 import os
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -6,39 +21,44 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.graphics.shapes import Drawing
 from reportlab.graphics.charts.barcharts import VerticalBarChart
 
-def generate_report_pdf(report, transactions, output_path=None):
+RENDER_WORKERS = int(os.getenv('PDF_RENDER_WORKERS', 1))
+RENDER_TIMEOUT = float(os.getenv('PDF_RENDER_TIMEOUT', 60))
+MONTHLY_CHART_MONTHS = 24
+ROLLING_MONTHS = int(os.getenv('ROLLING_SAVINGS_MONTHS', 3))
+
+_styles = None
+_pool = None
+
+def get_styles():
     """
-    Generates a professional fintech-grade financial report.
+    Sample stylesheet plus the custom report styles, built once per process.
     """
-    if output_path is None:
-        output_path = f"static/reports/report_{report.id}.pdf"
-    
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    
-    doc = SimpleDocTemplate(output_path, pagesize=letter)
+    global _styles
+    if _styles is not None:
+        return _styles
+
     styles = getSampleStyleSheet()
-    elements = []
 
     # Custom Styles
-    title_style = ParagraphStyle(
+    styles.add(ParagraphStyle(
         'TitleStyle',
         parent=styles['Heading1'],
         fontSize=26,
         textColor=colors.HexColor("#1e293b"),
         spaceAfter=20,
         alignment=1 # Center
-    )
-    
-    score_style = ParagraphStyle(
+    ))
+
+    styles.add(ParagraphStyle(
         'ScoreStyle',
         parent=styles['Normal'],
         fontSize=48,
         textColor=colors.HexColor("#2563eb"),
         alignment=1,
         fontName="Helvetica-Bold"
-    )
+    ))
 
-    section_header = ParagraphStyle(
+    styles.add(ParagraphStyle(
         'SectionHeader',
         parent=styles['Heading2'],
         fontSize=16,
@@ -48,18 +68,76 @@ def generate_report_pdf(report, transactions, output_path=None):
         borderPadding=5,
         borderWidth=0,
         leftIndent=0
-    )
+    ))
+
+    styles.add(ParagraphStyle('Subtitle', alignment=1, fontSize=10, textColor=colors.grey))
+
+    table_style = TableStyle([
+        ('BACKGROUND', (0,0), (1,0), colors.HexColor("#f1f5f9")),
+        ('TEXTCOLOR', (0,0), (1,0), colors.HexColor("#475569")),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('FONTNAME', (0,0), (1,0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0,0), (-1,0), 12),
+        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#e2e8f0"))
+    ])
+
+    _styles = {name: styles[name] for name in styles.byName}
+    _styles['SummaryTable'] = table_style
+    return _styles
+
+def report_payload(report):
+    """
+    Everything a render needs, as plain data that can cross process boundaries.
+    """
+    return {
+        "id": report.id,
+        "risk_score": report.risk_score,
+        "summary": report.summary_data or {},
+        "percentile": report.percentile
+    }
+
+def generate_report_pdf(report, transactions, output_path=None):
+    """
+    Generates a professional fintech-grade financial report.
+    """
+    if output_path is None:
+        output_path = f"static/reports/report_{report.id}.pdf"
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    render_report(report_payload(report), output_path)
+    return output_path
+
+def render_report_bytes(payload):
+    buffer = io.BytesIO()
+    render_report(payload, buffer)
+    return buffer.getvalue()
+
+def render_report(payload, output):
+    """
+    Renders a report payload into `output` (file path or binary file object).
+    """
+    doc = SimpleDocTemplate(output, pagesize=letter)
+    styles = get_styles()
+    risk_score = payload["risk_score"]
+    summary = payload["summary"]
+    elements = []
 
     # 1. Header & Score
-    elements.append(Paragraph("Financial Health Analysis", title_style))
+    elements.append(Paragraph("Financial Health Analysis", styles['TitleStyle']))
     elements.append(Spacer(1, 10))
-    elements.append(Paragraph(str(report.risk_score), score_style))
-    elements.append(Paragraph("FINANCIAL HEALTH SCORE", ParagraphStyle('Sub', alignment=1, fontSize=10, textColor=colors.grey)))
+    elements.append(Paragraph(str(risk_score), styles['ScoreStyle']))
+    elements.append(Paragraph("FINANCIAL HEALTH SCORE", styles['Subtitle']))
     elements.append(Spacer(1, 30))
+    percentile = payload.get("percentile") or {}
+    if percentile.get("overall") is not None:
+        elements.append(Paragraph(
+            f"Higher than {percentile['overall']}% of analyzed reports "
+            f"({percentile['risk_level']}% within the {summary.get('risk_level', 'same')} risk level)",
+            styles['Subtitle']))
+        elements.append(Spacer(1, 20))
 
     # 2. Executive Summary
-    summary = report.summary_data
-    elements.append(Paragraph("Executive Summary", section_header))
+    elements.append(Paragraph("Executive Summary", styles['SectionHeader']))
     
     data = [
         ["Metric", "Value"],
@@ -70,24 +148,40 @@ def generate_report_pdf(report, transactions, output_path=None):
     ]
     
     t = Table(data, colWidths=[200, 200])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (1,0), colors.HexColor("#f1f5f9")),
-        ('TEXTCOLOR', (0,0), (1,0), colors.HexColor("#475569")),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('GRID', (0,0), (-1,-1), 1, colors.HexColor("#e2e8f0"))
-    ]))
+    t.setStyle(styles['SummaryTable'])
     elements.append(t)
     elements.append(Spacer(1, 20))
 
+    # Consolidated (multi-account) reports list each account
+    accounts = summary.get('accounts')
+    if accounts:
+        elements.append(Paragraph("Accounts", styles['SectionHeader']))
+        rows = [["Account", "Income", "Expenses", "Score"]]
+        for account in accounts:
+            rows.append([
+                account['name'],
+                f"${account.get('total_income') or 0:,.2f}",
+                f"${account.get('total_expenses') or 0:,.2f}",
+                str(account.get('risk_score'))
+            ])
+        t = Table(rows, colWidths=[160, 100, 100, 60])
+        t.setStyle(styles['SummaryTable'])
+        elements.append(t)
+        transfers = summary.get('transfers') or {}
+        if transfers.get('count'):
+            elements.append(Spacer(1, 8))
+            elements.append(Paragraph(
+                f"{transfers['count']} transfers between your accounts (${transfers['amount']:,.2f}) "
+                "are excluded from the consolidated totals.", styles['Normal']))
+        elements.append(Spacer(1, 20))
+
     # 3. Risk Explanation
-    elements.append(Paragraph("Risk Assessment", section_header))
+    elements.append(Paragraph("Risk Assessment", styles['SectionHeader']))
     elements.append(Paragraph(summary.get('risk_analysis', "No detailed analysis available."), styles['Normal']))
     elements.append(Spacer(1, 20))
 
     # 4. Visual Breakdown (Chart)
-    elements.append(Paragraph("Spending Category Breakdown", section_header))
+    elements.append(Paragraph("Spending Category Breakdown", styles['SectionHeader']))
     
     cat_data = summary.get('category_breakdown', {})
     if cat_data:
@@ -105,18 +199,52 @@ def generate_report_pdf(report, transactions, output_path=None):
         drawing.add(bc)
         elements.append(drawing)
 
-    # 5. AI Recommendations (Simulated logic for now)
+    # 5. Monthly cash flow, from the monthly rollups
+    monthly = summary.get('monthly', [])[-MONTHLY_CHART_MONTHS:]
+    if len(monthly) > 1:
+        elements.append(Paragraph("Monthly Cash Flow", styles['SectionHeader']))
+        drawing = Drawing(400, 220)
+        bc = VerticalBarChart()
+        bc.x = 50
+        bc.y = 60
+        bc.height = 130
+        bc.width = 330
+        bc.data = [[m['income'] for m in monthly], [m['expenses'] for m in monthly]]
+        bc.categoryAxis.categoryNames = [m['month'] for m in monthly]
+        bc.categoryAxis.labels.angle = 45
+        bc.categoryAxis.labels.boxAnchor = 'ne'
+        bc.valueAxis.valueMin = 0
+        bc.valueAxis.valueMax = max(max(bc.data[0]), max(bc.data[1]), 1) * 1.2
+        bc.bars[0].fillColor = colors.HexColor("#22c55e")
+        bc.bars[1].fillColor = colors.HexColor("#ef4444")
+        drawing.add(bc)
+        elements.append(drawing)
+        elements.append(Paragraph("Green: income. Red: expenses.", styles['Subtitle']))
+
+        metrics = summary.get('metrics', {})
+        trend = []
+        if metrics.get('income_cv') is not None:
+            trend.append(f"Income variability (CV): {metrics['income_cv']:.0%}")
+        if metrics.get('expense_trend') is not None:
+            trend.append(f"Expense trend: {metrics['expense_trend']:+.0%} per month")
+        if metrics.get('savings_rate_rolling') is not None:
+            trend.append(f"Savings rate, last {ROLLING_MONTHS} months: {metrics['savings_rate_rolling']:.0%}")
+        if trend:
+            elements.append(Spacer(1, 8))
+            elements.append(Paragraph(" &nbsp;|&nbsp; ".join(trend), styles['Normal']))
+
+    # 6. AI Recommendations (Simulated logic for now)
     elements.append(PageBreak())
-    elements.append(Paragraph("AI Recommendations for Improvement", section_header))
+    elements.append(Paragraph("AI Recommendations for Improvement", styles['SectionHeader']))
     
     recommendations = []
-    if report.risk_score < 50:
+    if risk_score < 50:
         recommendations = [
             "• Immediate Action: Reduce discretionary spending in 'Dining Out' and 'Entertainment' by 50%.",
             "• Debt Strategy: Apply the 'Snowball Method' to clear high-interest debts first.",
             "• Emergency Fund: Aim to save $1,000 as a primary safety net."
         ]
-    elif report.risk_score < 80:
+    elif risk_score < 80:
         recommendations = [
             "• Optimization: Review recurring 'Utilities' or 'Misc' subscriptions to increase savings rate.",
             "• Investment: Direct 10% of net savings into a diversified index fund.",
@@ -134,4 +262,25 @@ def generate_report_pdf(report, transactions, output_path=None):
         elements.append(Spacer(1, 8))
 
     doc.build(elements)
-    return output_path
+
+def _warm_worker():
+    get_styles()
+
+def get_render_pool():
+    global _pool
+    if _pool is None:
+        # spawn: workers only import this module, never the forked web app state
+        _pool = ProcessPoolExecutor(
+            max_workers=RENDER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_worker
+        )
+    return _pool
+
+def render_report_in_pool(payload):
+    """
+    Renders off the request thread in the process pool and returns PDF bytes.
+    """
+    if RENDER_WORKERS <= 0:
+        return render_report_bytes(payload)
+    return get_render_pool().submit(render_report_bytes, payload).result(timeout=RENDER_TIMEOUT)
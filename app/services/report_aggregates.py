@@ -0,0 +1,192 @@
+"""
+RUNNING REPORT AGGREGATES
+Every report keeps the sums its score is built from (income/expense
+totals, debt/essential/discretionary spend, income deposit count,
+per-category totals) in `report_aggregate`. Appending a statement to a
+report then costs O(new rows): the new rows are deduplicated against the
+stored ones, reduced, and merged into the running totals.
+
+Monthly rollups (see timeseries.py) are stored alongside in
+`monthly_rollup`, one row per report and month, and merged the same way.
+
+Reports created before running aggregates existed get theirs built from
+their transactions on first use; `flask rescore-reports` backfills the
+monthly rollups.
+"""
+
+from collections import Counter
+from sqlalchemy import select, func, delete
+from models import db, ReportAggregate, MonthlyRollup, Transaction
+
+# (date, amount) pairs per dedupe query, well under SQLite's bound-parameter cap
+DEDUPE_LOOKUP_BATCH = 500
+
+def _cents(amount):
+    return int(round(float(amount) * 100))
+
+def load_aggregates(report):
+    """
+    Returns the running aggregates of `report` as a risk_engine aggregates dict.
+    """
+    row = report.aggregate
+    if row is None:
+        from app.services.risk_engine import compute_aggregates
+        # Transaction id order keeps the sums identical to the upload-time pass
+        rows = db.session.execute(
+            select(Transaction.amount, Transaction.category)
+            .where(Transaction.report_id == report.id)
+            .order_by(Transaction.id)
+        ).all()
+        return compute_aggregates(rows)
+    return {
+        "income_total": row.income_total,
+        "expense_total": row.expense_total,
+        "income_count": row.income_count,
+        "debt": row.debt,
+        "essentials": row.essentials,
+        "discretionary": row.discretionary,
+        "category_breakdown": dict(row.category_breakdown or {})
+    }
+
+def store_aggregates(report, aggregates):
+    row = report.aggregate
+    if row is None:
+        row = report.aggregate = ReportAggregate()
+    row.income_total = aggregates["income_total"]
+    row.expense_total = aggregates["expense_total"]
+    row.income_count = aggregates["income_count"]
+    row.debt = aggregates["debt"]
+    row.essentials = aggregates["essentials"]
+    row.discretionary = aggregates["discretionary"]
+    row.category_breakdown = dict(aggregates["category_breakdown"])
+
+def load_rollups(report_id):
+    """
+    {month: rollup} for one report, in the shape timeseries.py works with.
+    """
+    return _rollups_of(MonthlyRollup.query.filter_by(report_id=report_id).all())
+
+def _rollups_of(rows):
+    return {row.month: {
+        "income_total": row.income_total,
+        "expense_total": row.expense_total,
+        "income_count": row.income_count,
+        "category_breakdown": dict(row.category_breakdown or {})
+    } for row in rows}
+
+def _set_rollup(row, rollup):
+    row.income_total = rollup["income_total"]
+    row.expense_total = rollup["expense_total"]
+    row.income_count = rollup["income_count"]
+    row.category_breakdown = dict(rollup["category_breakdown"])
+
+def store_rollups(report_id, delta):
+    """
+    Adds the monthly rollups of newly written transactions to the report's
+    stored ones. Only the touched months are read.
+    """
+    if not delta:
+        return
+    from app.services.timeseries import merge_rollups
+    existing = {row.month: row for row in MonthlyRollup.query.filter(
+        MonthlyRollup.report_id == report_id, MonthlyRollup.month.in_(list(delta)))}
+    current = _rollups_of(existing.values())
+    for month, rollup in merge_rollups(current, delta).items():
+        row = existing.get(month)
+        if row is None:
+            row = MonthlyRollup(report_id=report_id, month=month)
+            db.session.add(row)
+        _set_rollup(row, rollup)
+
+def replace_rollups(rollups_by_report):
+    """
+    Overwrites the stored rollups of every report in {report_id: rollups}.
+    """
+    if not rollups_by_report:
+        return
+    db.session.execute(delete(MonthlyRollup).where(MonthlyRollup.report_id.in_(list(rollups_by_report))))
+    for report_id, rollups in rollups_by_report.items():
+        for month, rollup in rollups.items():
+            row = MonthlyRollup(report_id=report_id, month=month)
+            _set_rollup(row, rollup)
+            db.session.add(row)
+
+class TransactionDeduper:
+    """
+    Filters appended rows down to the ones the report doesn't have yet,
+    keyed by (date, description, amount in cents).
+
+    Matching counts occurrences: when a statement repeats a key three times
+    and the report already holds two, one row is new. Re-uploading an
+    overlapping statement therefore adds only the missing rows, while two
+    identical coffees on the same day both survive.
+
+    Stored rows are looked up by the chunk's own (date, amount) pairs on the
+    (report_id, date, amount) index, so the cost follows the new rows, not
+    the report's history. Only rows that existed before the append started
+    count as existing, so the rows this append writes never hide its later
+    chunks.
+    """
+    def __init__(self, report_id):
+        self.report_id = report_id
+        self.max_id = db.session.execute(
+            select(func.max(Transaction.id)).where(Transaction.report_id == report_id)
+        ).scalar()
+        self.seen = Counter()
+        self.duplicates = 0
+
+    def _lookup(self, by_date, dates):
+        amounts = set().union(*(by_date[date] for date in dates))
+        wanted = {(date, _cents(amount)) for date in dates for amount in by_date[date]}
+        # Separate IN lists seek the index on every backend; the cross
+        # product they also match is filtered back to the chunk's pairs
+        rows = db.session.execute(
+            select(Transaction.date, Transaction.description, Transaction.amount)
+            .where(Transaction.report_id == self.report_id,
+                   Transaction.date.in_(dates),
+                   Transaction.amount.in_(amounts),
+                   Transaction.id <= self.max_id)
+        )
+        return Counter(
+            (date, description, _cents(amount)) for date, description, amount in rows
+            if (date, _cents(amount)) in wanted
+        )
+
+    def _existing(self, pairs):
+        existing = Counter()
+        if self.max_id is None:
+            return existing
+        by_date = {}
+        for date, amount in pairs:
+            by_date.setdefault(date, set()).add(amount)
+
+        batch, size = [], 0
+        for date, amounts in by_date.items():
+            batch.append(date)
+            size += len(amounts)
+            if size >= DEDUPE_LOOKUP_BATCH:
+                existing.update(self._lookup(by_date, batch))
+                batch, size = [], 0
+        if batch:
+            existing.update(self._lookup(by_date, batch))
+        return existing
+
+    def new_rows(self, chunk):
+        """
+        chunk: DataFrame of valid rows with typed date/description/amount.
+        Returns the rows not already in the report.
+        """
+        if chunk.empty:
+            return chunk
+        dates = chunk['date'].dt.date.tolist()
+        amounts = chunk['amount'].tolist()
+        existing = self._existing(zip(dates, amounts))
+
+        keep = []
+        for key in zip(dates, chunk['description'].tolist(), map(_cents, amounts)):
+            occurrence = self.seen[key]
+            self.seen[key] += 1
+            keep.append(occurrence >= existing[key])
+        kept = chunk[keep]
+        self.duplicates += len(chunk) - len(kept)
+        return kept
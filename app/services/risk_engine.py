@@ -10,22 +10,151 @@ Formulas & Methodology:
    - Goal: < 50% (50/30/20 rule).
 4. Discretionary Spending Ratio (DSR): Total Non-Essentials / Total Income
    - Goal: < 30%.
-5. Income Stability (IS): Coefficient of variation/Source count (Simulated)
-   - Reward consistent income streams.
+5. Income Stability (IS): Coefficient of variation of monthly income,
+   read from the monthly rollups (see timeseries.py).
+   - Reward consistent income streams: CV <= 10% earns full points.
+   - Histories under 3 months fall back to the income deposit count.
+
+Implementation:
+Transactions are reduced column-wise. Categories are factorized to integer
+codes and every total (income/expense by sign, debt/essential/discretionary
+spend, category breakdown) comes from np.bincount over those codes, keyed by
+report so thousands of reports can be scored in one call. bincount
+accumulates each bin in input order, so the sums match the original
+per-transaction loops exactly.
 """
 
-def calculate_risk_score(transactions):
+import numpy as np
+import pandas as pd
+from app.services.timeseries import monthly_rollups, monthly_rollups_batch, series_metrics, MIN_MONTHS_FOR_STABILITY
+
+INCOME, EXPENSE, ZERO = 0, 1, 2
+
+# Spending groups used by the ratios below
+OTHER, DEBT, ESSENTIAL, DISCRETIONARY = 0, 1, 2, 3
+
+DEBT_CATEGORIES = ["Debt/Interest"]
+ESSENTIAL_CATEGORIES = ["Rent/Mortgage", "Utilities", "Groceries", "Transport", "Health"]
+DISCRETIONARY_CATEGORIES = ["Entertainment", "Dining Out", "Misc"]
+
+_CATEGORY_GROUPS = {
+    **{c: DEBT for c in DEBT_CATEGORIES},
+    **{c: ESSENTIAL for c in ESSENTIAL_CATEGORIES},
+    **{c: DISCRETIONARY for c in DISCRETIONARY_CATEGORIES}
+}
+
+def to_columns(transactions):
+    """
+    Accepts a DataFrame with `amount`/`category` columns or any iterable of
+    objects exposing `.amount` and `.category` (ORM rows, namedtuples).
+    Returns (amounts float64 array, categories object array).
+    """
+    if isinstance(transactions, pd.DataFrame):
+        return (
+            transactions['amount'].to_numpy(dtype=np.float64),
+            transactions['category'].to_numpy(dtype=object)
+        )
+    rows = [(tx.amount, tx.category) for tx in transactions]
+    if not rows:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=object)
+    amounts, categories = zip(*rows)
+    return np.asarray(amounts, dtype=np.float64), np.asarray(categories, dtype=object)
+
+def _total(sums, counts):
+    # Python's sum() over an empty selection returns int 0; keep that shape
+    return float(sums) if counts else 0
+
+def _reduce(amounts, categories, group_index, n_groups):
+    """
+    Grouped reduction over (report, category code, sign). Returns one
+    aggregates dict per group.
+    """
+    # Uncategorized rows are shown as Misc but don't count as discretionary
+    missing = pd.isna(categories) | np.array([not c for c in categories], dtype=bool)
+    labels = np.where(missing, "Misc", categories)
+    codes, uniques = pd.factorize(labels)
+    n_codes = max(len(uniques), 1)
+
+    code_groups = np.array([_CATEGORY_GROUPS.get(c, OTHER) for c in uniques], dtype=np.intp)
+    spend_groups = code_groups[codes] if len(codes) else np.empty(0, dtype=np.intp)
+    spend_groups[missing] = OTHER
+
+    signs = np.where(amounts > 0, INCOME, np.where(amounts < 0, EXPENSE, ZERO))
+    magnitudes = np.abs(amounts)
+
+    sign_keys = group_index * 3 + signs
+    sign_sums = np.bincount(sign_keys, weights=amounts, minlength=n_groups * 3).reshape(n_groups, 3)
+    sign_counts = np.bincount(sign_keys, minlength=n_groups * 3).reshape(n_groups, 3)
+
+    expense = signs == EXPENSE
+    spend_keys = group_index[expense] * 4 + spend_groups[expense]
+    spend_sums = np.bincount(spend_keys, weights=magnitudes[expense], minlength=n_groups * 4).reshape(n_groups, 4)
+    spend_counts = np.bincount(spend_keys, minlength=n_groups * 4).reshape(n_groups, 4)
+
+    category_keys = group_index * n_codes + codes
+    category_sums = np.bincount(category_keys, weights=magnitudes, minlength=n_groups * n_codes)
+
+    aggregates = []
+    for g in range(n_groups):
+        aggregates.append({
+            "income_total": _total(sign_sums[g, INCOME], sign_counts[g, INCOME]),
+            "expense_total": abs(_total(sign_sums[g, EXPENSE], sign_counts[g, EXPENSE])),
+            "income_count": int(sign_counts[g, INCOME]),
+            "debt": _total(spend_sums[g, DEBT], spend_counts[g, DEBT]),
+            "essentials": _total(spend_sums[g, ESSENTIAL], spend_counts[g, ESSENTIAL]),
+            "discretionary": _total(spend_sums[g, DISCRETIONARY], spend_counts[g, DISCRETIONARY]),
+            "category_breakdown": {}
+        })
+
+    # Breakdown keys follow first appearance, like the original dict build-up
+    for key in pd.unique(category_keys):
+        g, code = divmod(int(key), n_codes)
+        aggregates[g]["category_breakdown"][uniques[code]] = float(category_sums[key])
+
+    return aggregates
+
+def compute_aggregates(transactions):
+    """
+    Single grouped pass producing every total needed for scoring and display.
+    """
+    amounts, categories = to_columns(transactions)
+    group_index = np.zeros(len(amounts), dtype=np.intp)
+    return _reduce(amounts, categories, group_index, 1)[0]
+
+def compute_aggregates_batch(frame):
+    """
+    frame: DataFrame with `report_id`, `amount` and `category` columns.
+    Returns {report_id: aggregates}.
+    """
+    group_index, report_ids = pd.factorize(frame['report_id'])
+    amounts, categories = to_columns(frame)
+    aggregates = _reduce(amounts, categories, group_index.astype(np.intp), len(report_ids))
+    return {report_id.item() if hasattr(report_id, 'item') else report_id: agg
+            for report_id, agg in zip(report_ids, aggregates)}
+
+AGGREGATE_SUMS = ("income_total", "expense_total", "income_count", "debt", "essentials", "discretionary")
+
+def merge_aggregates(base, delta):
+    """
+    Folds the aggregates of newly added transactions into running totals.
+    Every field is a sum, so appending rows never needs the old rows again.
+    """
+    merged = {key: base[key] + delta[key] for key in AGGREGATE_SUMS}
+    breakdown = dict(base["category_breakdown"])
+    for category, amount in delta["category_breakdown"].items():
+        breakdown[category] = breakdown.get(category, 0) + amount
+    merged["category_breakdown"] = breakdown
+    return merged
+
+def score_from_aggregates(aggregates, series=None):
     """
     Fintech-grade risk assessment engine.
     Calculates a score (0-100) based on liquidity, debt, and spending efficiency.
+    `series` is timeseries.series_metrics() output for the same report.
     """
-    # Group transactions
-    income_txs = [tx for tx in transactions if tx.amount > 0]
-    expense_txs = [tx for tx in transactions if tx.amount < 0]
-    
-    total_income = sum(tx.amount for tx in income_txs)
-    total_expenses = abs(sum(tx.amount for tx in expense_txs))
-    
+    total_income = aggregates["income_total"]
+    total_expenses = aggregates["expense_total"]
+
     if total_income <= 0:
         return {
             "score": 0,
@@ -41,28 +170,28 @@ def calculate_risk_score(transactions):
 
     # 2. Debt-to-Income (Max 20 points)
     # Categorized as 'Debt/Interest' in ai_service
-    debt_payments = sum(abs(tx.amount) for tx in expense_txs if tx.category == "Debt/Interest")
-    dti_ratio = debt_payments / total_income
+    dti_ratio = aggregates["debt"] / total_income
     # Score decreases as DTI exceeds 36%
     dti_score = max(0, 20 - (max(0, dti_ratio - 0.10) / 0.26) * 20)
 
     # 3. Essential Spending (Max 25 points)
     # Goal: Essentials < 50% of income
-    essential_cats = ["Rent/Mortgage", "Utilities", "Groceries", "Transport", "Health"]
-    essentials = sum(abs(tx.amount) for tx in expense_txs if tx.category in essential_cats)
-    esr_ratio = essentials / total_income
+    esr_ratio = aggregates["essentials"] / total_income
     esr_score = max(0, 25 - (max(0, esr_ratio - 0.30) / 0.50) * 25)
 
     # 4. Discretionary Ratio (Max 15 points)
     # Goal: < 30%
-    discretionary_cats = ["Entertainment", "Dining Out", "Misc"]
-    discretionary = sum(abs(tx.amount) for tx in expense_txs if tx.category in discretionary_cats)
-    dsr_ratio = discretionary / total_income
+    dsr_ratio = aggregates["discretionary"] / total_income
     dsr_score = max(0, 15 - (max(0, dsr_ratio - 0.20) / 0.30) * 15)
 
     # 5. Income Stability (Max 10 points)
-    # Simple proxy: number of deposits/consistency
-    stability_score = min(10, len(income_txs) * 2.5)
+    cv = series["income_cv"] if series and series["months"] >= MIN_MONTHS_FOR_STABILITY else None
+    if cv is not None:
+        # Full points up to a 10% CV, none from 100%
+        stability_score = 10 * min(1, max(0, (1 - cv) / 0.9))
+    else:
+        # Short histories: number of deposits as a proxy
+        stability_score = min(10, aggregates["income_count"] * 2.5)
 
     final_score = int(sr_score + dti_score + esr_score + dsr_score + stability_score)
     final_score = max(0, min(100, final_score))
@@ -86,21 +215,53 @@ def calculate_risk_score(transactions):
             "savings_rate": round(savings_rate, 2),
             "dti_ratio": round(dti_ratio, 2),
             "essential_ratio": round(esr_ratio, 2),
-            "discretionary_ratio": round(dsr_ratio, 2)
+            "discretionary_ratio": round(dsr_ratio, 2),
+            **_series_metrics_summary(series)
         }
     }
 
-def aggregate_report_data(transactions):
+def _series_metrics_summary(series):
+    if not series or not series["months"]:
+        return {}
+    rounded = lambda value: None if value is None else round(value, 2)
+    return {
+        "income_cv": rounded(series["income_cv"]),
+        "expense_trend": rounded(series["expense_trend"]),
+        "savings_rate_rolling": rounded(series["savings_rate_rolling"])
+    }
+
+def summary_from_aggregates(aggregates):
     """
     Aggregates transactions for frontend display and PDF.
     """
-    categories = {}
-    for tx in transactions:
-        cat = tx.category or "Misc"
-        categories[cat] = categories.get(cat, 0) + abs(tx.amount)
-        
     return {
-        "total_income": sum(tx.amount for tx in transactions if tx.amount > 0),
-        "total_expenses": sum(abs(tx.amount) for tx in transactions if tx.amount < 0),
-        "category_breakdown": categories
+        "total_income": aggregates["income_total"],
+        "total_expenses": aggregates["expense_total"],
+        "category_breakdown": dict(aggregates["category_breakdown"])
+    }
+
+def calculate_risk_score(transactions):
+    # Dated frames also get the time-series stability metrics
+    series = None
+    if isinstance(transactions, pd.DataFrame) and 'date' in transactions:
+        series = series_metrics(monthly_rollups(transactions))
+    return score_from_aggregates(compute_aggregates(transactions), series)
+
+def aggregate_report_data(transactions):
+    return summary_from_aggregates(compute_aggregates(transactions))
+
+def score_reports(frame):
+    """
+    Batch API: scores every report in `frame` (columns `report_id`, `amount`,
+    `category`) in one grouped reduction. Returns {report_id: risk_data}.
+    With a `date` column the monthly rollups are built in one grouped pass
+    too, so the scores match upload and rescore_reports for the same rows.
+    """
+    rollups = monthly_rollups_batch(frame) if 'date' in frame else None
+    return {
+        report_id: score_from_aggregates(
+            aggregates,
+            None if rollups is None else series_metrics(rollups.get(report_id, {}))
+        )
+        for report_id, aggregates in compute_aggregates_batch(frame).items()
     }
@@ -0,0 +1,91 @@
+"""
+RULE-BASED FAST-PATH CATEGORIZER
+Classifies obvious merchants ("PAYROLL", "RENT", "GROCERY", utility names)
+locally before anything is sent to the LLM.
+
+Rules are whole-word keywords and phrases. They are compiled into a single
+hash table keyed by word n-grams (up to MAX_PHRASE_WORDS words), so each
+description is tokenized once with one C-level regex and matched with a few
+dict lookups per word, with no per-rule scanning. Columns are factorized first,
+so every distinct description is matched only once.
+
+When several keywords hit, the highest confidence wins; ties go to the
+leftmost, longest phrase ("UBER EATS" beats "UBER").
+"""
+
+import os
+import re
+import numpy as np
+import pandas as pd
+
+HIGH, MEDIUM, LOW = 0.95, 0.75, 0.5
+
+# Matches at or above this confidence skip the LLM entirely
+MIN_CONFIDENCE = float(os.getenv('RULE_MIN_CONFIDENCE', 0.9))
+
+RULES = [
+    # (category, confidence, keywords)
+    ("Income", HIGH, ["PAYROLL", "DIRECT DEPOSIT", "DIRECT DEP", "DIR DEP", "SALARY", "PAYCHECK", "ADP PAYROLL"]),
+    ("Savings/Investment", HIGH, ["TRANSFER TO SAVINGS", "VANGUARD", "FIDELITY", "SCHWAB", "ROBINHOOD", "BETTERMENT", "WEALTHFRONT", "401K", "401 K", "ROTH IRA"]),
+    ("Debt/Interest", HIGH, ["INTEREST CHARGE", "FINANCE CHARGE", "LATE FEE", "LOAN PAYMENT", "LOAN PMT", "STUDENT LOAN", "AUTO LOAN", "NAVIENT", "NELNET", "SALLIE MAE"]),
+    ("Rent/Mortgage", HIGH, ["RENT", "MORTGAGE", "MTG PMT", "PROPERTY MGMT", "PROPERTY MANAGEMENT", "HOA DUES"]),
+    ("Dining Out", HIGH, ["UBER EATS", "UBEREATS", "DOORDASH", "GRUBHUB", "RESTAURANT", "STARBUCKS", "MCDONALD'S", "MCDONALDS", "CHIPOTLE", "DUNKIN", "SUBWAY", "PIZZA", "BURGER", "TACO BELL"]),
+    ("Utilities", HIGH, ["GAS & ELECTRIC", "PG&E", "CON ED", "CONED", "DUKE ENERGY", "ELECTRIC", "UTILITY", "UTILITIES", "WATER DEPT", "COMCAST", "XFINITY", "SPECTRUM", "VERIZON", "AT&T", "T-MOBILE", "INTERNET"]),
+    ("Groceries", HIGH, ["GROCERY", "GROCERIES", "GROCER", "SUPERMARKET", "WHOLE FOODS", "WFM", "TRADER JOE'S", "TRADER JOES", "KROGER", "SAFEWAY", "ALDI", "PUBLIX", "WEGMANS", "HEB"]),
+    ("Transport", HIGH, ["GAS STATION", "SHELL OIL", "CHEVRON", "EXXON", "EXXONMOBIL", "MOBIL", "LYFT", "UBER", "TRANSIT", "METRO", "PARKING", "TOLL", "AIRLINE", "AIRLINES"]),
+    ("Entertainment", HIGH, ["NETFLIX", "SPOTIFY", "HULU", "DISNEY+", "DISNEYPLUS", "DISNEY PLUS", "HBO", "CINEMA", "THEATRE", "THEATER", "STEAM GAMES", "PLAYSTATION", "XBOX", "TICKETMASTER"]),
+    ("Health", HIGH, ["PHARMACY", "CVS", "WALGREENS", "HOSPITAL", "CLINIC", "DENTAL", "MEDICAL", "OPTOMETRY", "OPTOMETRIST"]),
+    # Weaker signals: still usable when no LLM is configured
+    ("Income", MEDIUM, ["DEPOSIT"]),
+    ("Groceries", MEDIUM, ["COSTCO", "MARKET"]),
+    ("Transport", MEDIUM, ["SHELL", "FUEL", "GAS"]),
+    ("Dining Out", MEDIUM, ["CAFE", "COFFEE", "GRILL"]),
+    ("Health", MEDIUM, ["GYM", "FITNESS", "DOCTOR", "DR"]),
+    ("Groceries", LOW, ["WALMART", "TARGET"]),
+]
+
+_TOKEN = re.compile(r"[A-Z0-9&'+-]+")
+
+def _compile(rules):
+    """
+    Builds {word tuple: (category, confidence)}. The first rule listing a
+    keyword keeps it.
+    """
+    table = {}
+    longest = 1
+    for category, confidence, keywords in rules:
+        for keyword in keywords:
+            words = tuple(_TOKEN.findall(keyword.upper()))
+            longest = max(longest, len(words))
+            table.setdefault(words, (category, confidence))
+    return table, longest
+
+_TABLE, MAX_PHRASE_WORDS = _compile(RULES)
+_NO_MATCH = (None, 0.0)
+
+def _match(description):
+    words = _TOKEN.findall(description.upper())
+    best = _NO_MATCH
+    for start in range(len(words)):
+        for size in range(min(MAX_PHRASE_WORDS, len(words) - start), 0, -1):
+            hit = _TABLE.get(tuple(words[start:start + size]))
+            if hit is not None:
+                if hit[1] >= HIGH:
+                    return hit
+                if hit[1] > best[1]:
+                    best = hit
+                break
+    return best
+
+def categorize(descriptions):
+    """
+    descriptions: list/array/Series of strings.
+    Returns (categories, confidences) aligned with the input; unmatched rows
+    get category None and confidence 0.0.
+    """
+    codes, uniques = pd.factorize(pd.Series(descriptions, dtype=object), use_na_sentinel=False)
+    matched = [_match(str(u)) for u in uniques]
+
+    unique_categories = np.array([m[0] for m in matched], dtype=object)
+    unique_confidences = np.array([m[1] for m in matched], dtype=np.float64)
+    return unique_categories[codes], unique_confidences[codes]
@@ -0,0 +1,248 @@
+"""
+SCORE DISTRIBUTION
+Population histograms of risk scores (101 buckets, one per score) answer
+"how do I compare?" without scanning reports:
+
+- "all":              every customer report
+- "level:<Low|...>":  reports in the same risk level
+- "month:<YYYY-MM>":  reports created in the same month
+
+Counts are kept incrementally as reports are scored (record_change runs on
+the caller's session and commits with the score). rebuild_distribution()
+recomputes them from the report table. Account reports of a batch upload
+are left out: their consolidated report represents the customer.
+
+Every change also bumps a shared version (the "version" row of the same
+table). Each process caches cumulative counts per scope together with the
+version they were read at, and re-reads a scope only when the version has
+moved, so every worker and node answers with the same numbers for the same
+version, at the cost of one primary-key read per lookup. get_report puts
+the version in its ETag.
+
+The rank printed on a report's PDF is a snapshot stored on the report
+(Report.percentile) when it is scored and when it is paid, so the PDF and
+its artifact key don't move as other reports come in.
+"""
+
+import threading
+from datetime import datetime
+from sqlalchemy import select, func, delete, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Report, ScoreHistogram
+
+BUCKETS = 101
+OVERALL = "all"
+# Row (VERSION_SCOPE, 0) counts histogram changes
+VERSION_SCOPE = "version"
+
+# Same thresholds as risk_engine.score_from_aggregates
+LOW_RISK_MIN = 80
+MODERATE_RISK_MIN = 50
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def risk_level(score):
+    if score >= LOW_RISK_MIN:
+        return "Low"
+    if score >= MODERATE_RISK_MIN:
+        return "Moderate"
+    return "High"
+
+def scopes_for(score, created_at):
+    month = (created_at or datetime.utcnow()).strftime('%Y-%m')
+    return [OVERALL, f"level:{risk_level(score)}", f"month:{month}"]
+
+def _bucket(score):
+    return max(0, min(BUCKETS - 1, int(score)))
+
+def _upsert_increment(scope, bucket, delta):
+    table = ScoreHistogram.__table__
+    dialect = db.session.connection().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(scope=scope, bucket=bucket, count=delta)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['scope', 'bucket'],
+            set_={"count": table.c.count + stmt.excluded.count}
+        )
+        db.session.execute(stmt)
+        return
+
+    updated = db.session.execute(
+        table.update()
+        .where(table.c.scope == scope, table.c.bucket == bucket)
+        .values(count=table.c.count + delta)
+    )
+    if updated.rowcount == 0:
+        db.session.execute(table.insert().values(scope=scope, bucket=bucket, count=delta))
+
+def record_change(report, old_score, new_score):
+    """
+    Moves `report` from its old score's buckets to the new one's. Either
+    score may be None (not scored yet).
+    """
+    if report.parent_id is not None or old_score == new_score:
+        return
+    deltas = {}
+    if old_score is not None:
+        for scope in scopes_for(old_score, report.created_at):
+            key = (scope, _bucket(old_score))
+            deltas[key] = deltas.get(key, 0) - 1
+    if new_score is not None:
+        for scope in scopes_for(new_score, report.created_at):
+            key = (scope, _bucket(new_score))
+            deltas[key] = deltas.get(key, 0) + 1
+    changed = False
+    for (scope, bucket), delta in sorted(deltas.items()):
+        if delta:
+            _upsert_increment(scope, bucket, delta)
+            changed = True
+    if changed:
+        _upsert_increment(VERSION_SCOPE, 0, 1)
+
+def _month(column):
+    if db.session.connection().dialect.name == 'sqlite':
+        return func.strftime('%Y-%m', column)
+    return func.to_char(column, 'YYYY-MM')
+
+def rebuild_distribution(batch_size=1000):
+    """
+    Recomputes every histogram from the report table, then snapshots the
+    percentiles of scored reports that don't have one yet. Returns the
+    number of reports counted.
+    """
+    month = _month(Report.created_at)
+    rows = db.session.execute(
+        select(month, Report.risk_score, func.count(Report.id))
+        .where(Report.parent_id.is_(None), Report.risk_score.is_not(None))
+        .group_by(month, Report.risk_score)
+    ).all()
+
+    counts = {}
+    for report_month, score, count in rows:
+        bucket = _bucket(score)
+        for scope in (OVERALL, f"level:{risk_level(score)}", f"month:{report_month}"):
+            counts[(scope, bucket)] = counts.get((scope, bucket), 0) + count
+
+    db.session.execute(delete(ScoreHistogram).where(ScoreHistogram.scope != VERSION_SCOPE))
+    db.session.add_all([ScoreHistogram(scope=scope, bucket=bucket, count=count)
+                        for (scope, bucket), count in sorted(counts.items())])
+    _upsert_increment(VERSION_SCOPE, 0, 1)
+    db.session.commit()
+    clear_cache()
+
+    distributions = {}
+    last_id = 0
+    while True:
+        reports = db.session.execute(
+            select(Report.id, Report.risk_score, Report.created_at)
+            .where(Report.id > last_id, Report.risk_score.is_not(None), Report.percentile.is_(None))
+            .order_by(Report.id)
+            .limit(batch_size)
+        ).all()
+        if not reports:
+            break
+        for report_id, score, created_at in reports:
+            db.session.execute(update(Report).where(Report.id == report_id)
+                               .values(percentile=_snapshot(score, created_at, distributions)))
+        db.session.commit()
+        last_id = reports[-1].id
+    return sum(count for _, _, count in rows)
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+def current_version():
+    """
+    The shared histogram version; 0 before the first scored report.
+    """
+    return db.session.execute(
+        select(ScoreHistogram.count).where(ScoreHistogram.scope == VERSION_SCOPE, ScoreHistogram.bucket == 0)
+    ).scalar() or 0
+
+def _read(scope):
+    """
+    (counts per bucket, reports below each bucket, total) for `scope`.
+    """
+    counts = [0] * BUCKETS
+    for bucket, count in db.session.execute(
+            select(ScoreHistogram.bucket, ScoreHistogram.count).where(ScoreHistogram.scope == scope)):
+        counts[bucket] = count
+    below = [0] * BUCKETS
+    for bucket in range(1, BUCKETS):
+        below[bucket] = below[bucket - 1] + counts[bucket - 1]
+    return counts, below, below[-1] + counts[-1]
+
+def _distribution(scope, version):
+    with _cache_lock:
+        cached = _cache.get(scope)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    distribution = _read(scope)
+    with _cache_lock:
+        _cache[scope] = (version, distribution)
+    return distribution
+
+def _rank(distribution, score):
+    """
+    Share of the distribution scoring below `score` (ties count half), as a
+    whole percent. None while it is empty.
+    """
+    counts, below, total = distribution
+    if total <= 0:
+        return None
+    bucket = _bucket(score)
+    rank = (below[bucket] + 0.5 * counts[bucket]) / total
+    return max(0, min(100, round(rank * 100)))
+
+def _percentiles(score, created_at, load):
+    overall, level, month = scopes_for(score, created_at)
+    distribution = load(overall)
+    return {
+        "overall": _rank(distribution, score),
+        "risk_level": _rank(load(level), score),
+        "month": _rank(load(month), score),
+        "population": distribution[2]
+    }
+
+def percentile(score, scope=OVERALL, version=None):
+    """
+    `score`'s percentile within `scope`, as of histogram `version` (the
+    current one when not given).
+    """
+    if version is None:
+        version = current_version()
+    return _rank(_distribution(scope, version), score)
+
+def percentiles_for(score, created_at, version=None):
+    """
+    Overall, same-risk-level and same-month percentiles for a score, as of
+    histogram `version` (the current one when not given).
+    """
+    if score is None:
+        return None
+    if version is None:
+        version = current_version()
+    return _percentiles(score, created_at, lambda scope: _distribution(scope, version))
+
+def _snapshot(score, created_at, distributions):
+    if score is None:
+        return None
+
+    def load(scope):
+        if scope not in distributions:
+            distributions[scope] = _read(scope)
+        return distributions[scope]
+    return _percentiles(score, created_at, load)
+
+def snapshot(report, distributions=None):
+    """
+    The report's percentiles for storing on it, read from the histograms
+    on the caller's session so a score recorded in the same transaction
+    counts. Bypasses the shared cache, which must never hold uncommitted
+    counts; `distributions` (a dict) reuses reads across many reports.
+    """
+    return _snapshot(report.risk_score, report.created_at, {} if distributions is None else distributions)
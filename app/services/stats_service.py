@@ -0,0 +1,176 @@
+"""
+MATERIALIZED ADMIN STATS
+Keeps running totals (StatsTotals, a single row) and per-day buckets
+(DailyStats) up to date as reports are created and payments recorded, so
+/admin/stats is O(1) however large the tables grow.
+
+Increments run on the caller's session and commit with the event that
+caused them. rebuild_stats() recomputes both tables from the source rows;
+run it (`flask rebuild-stats`) once on a database that already has reports
+when the tables are first deployed, or the running totals start at zero.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, delete, cast, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, User, Report, Payment, StatsTotals, DailyStats
+
+COUNTERS = ("users", "reports", "paid_reports", "revenue")
+TOTALS_ID = 1
+
+def _upsert_increment(model, key, increments):
+    table = model.__table__
+    key_column = next(iter(key))
+    dialect = db.session.connection().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        values = {name: 0 for name in COUNTERS}
+        values.update(increments)
+        values.update(key)
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[key_column],
+            set_={name: table.c[name] + stmt.excluded[name] for name in increments}
+        )
+        db.session.execute(stmt)
+        return
+
+    updated = db.session.execute(
+        table.update()
+        .where(table.c[key_column] == key[key_column])
+        .values({name: table.c[name] + value for name, value in increments.items()})
+    )
+    if updated.rowcount == 0:
+        values = {name: 0 for name in COUNTERS}
+        values.update(increments)
+        values.update(key)
+        db.session.execute(table.insert().values(**values))
+
+def record(day=None, **increments):
+    """
+    record(reports=1), record(paid_reports=1, revenue=19.0), ...
+    Bumps the totals row and the day's bucket (UTC today by default).
+    """
+    increments = {name: value for name, value in increments.items() if value}
+    if not increments:
+        return
+    _upsert_increment(StatsTotals, {"id": TOTALS_ID}, increments)
+    _upsert_increment(DailyStats, {"day": day or datetime.utcnow().date()}, increments)
+
+def get_totals():
+    """
+    The running totals. Until the first report or `flask rebuild-stats`
+    creates the row, they are computed live; reads never write.
+    """
+    totals = db.session.get(StatsTotals, TOTALS_ID)
+    if totals is None:
+        return live_totals()
+    return {
+        "total_users": totals.users,
+        "total_reports": totals.reports,
+        "paid_reports": totals.paid_reports,
+        "total_revenue": totals.revenue
+    }
+
+def get_daily(days=30):
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = (DailyStats.query
+            .filter(DailyStats.day >= since)
+            .order_by(DailyStats.day)
+            .all())
+    return [{
+        "day": row.day.isoformat(),
+        "users": row.users,
+        "reports": row.reports,
+        "paid_reports": row.paid_reports,
+        "revenue": row.revenue
+    } for row in rows]
+
+def live_totals():
+    """
+    All four totals computed by SQL aggregates in a single round trip.
+    Reports are uploads: a batch's account reports aren't counted.
+    """
+    row = db.session.execute(select(
+        select(func.count(User.id)).scalar_subquery(),
+        select(func.count(Report.id)).where(Report.parent_id.is_(None)).scalar_subquery(),
+        select(func.count(Report.id)).where(Report.paid.is_(True)).scalar_subquery(),
+        select(func.coalesce(func.sum(Payment.amount), 0.0)).scalar_subquery()
+    )).one()
+    return {
+        "total_users": row[0],
+        "total_reports": row[1],
+        "paid_reports": row[2],
+        "total_revenue": float(row[3])
+    }
+
+def _day(column):
+    # SQLite has no DATE type; CAST would yield just the year
+    if db.session.connection().dialect.name == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+def rebuild_stats():
+    """
+    Recomputes the materialized tables from users, reports and payments.
+    Paid reports are bucketed by their payment date when one exists.
+    """
+    daily = {}
+
+    def bucket(day):
+        return daily.setdefault(day, {name: 0 for name in COUNTERS})
+
+    user_day = _day(User.created_at)
+    for day, count in db.session.execute(select(user_day, func.count(User.id)).group_by(user_day)):
+        bucket(day)["users"] += count
+
+    # Batch account reports count as part of their consolidated report
+    report_day = _day(Report.created_at)
+    uploads = select(report_day, func.count(Report.id)).where(Report.parent_id.is_(None)).group_by(report_day)
+    for day, count in db.session.execute(uploads):
+        bucket(day)["reports"] += count
+
+    payment_day = _day(Payment.created_at)
+    payments = select(payment_day, func.coalesce(func.sum(Payment.amount), 0.0)).group_by(payment_day)
+    for day, revenue in db.session.execute(payments):
+        bucket(day)["revenue"] += float(revenue)
+
+    # One paid report per distinct report with a payment, dated by its first payment
+    first_payment = (select(Payment.report_id, func.min(Payment.created_at).label("paid_at"))
+                     .group_by(Payment.report_id).subquery())
+    paid_day = _day(first_payment.c.paid_at)
+    paid_with_payment = 0
+    for day, count in db.session.execute(select(paid_day, func.count()).group_by(paid_day)):
+        bucket(day)["paid_reports"] += count
+        paid_with_payment += count
+
+    # Reports marked paid through session verification may have no Payment row
+    totals = live_totals()
+    unmatched = totals["paid_reports"] - paid_with_payment
+    if unmatched > 0:
+        unpaid_day = _day(Report.created_at)
+        orphans = (select(unpaid_day, func.count(Report.id))
+                   .where(Report.paid.is_(True))
+                   .where(~Report.id.in_(select(Payment.report_id)))
+                   .group_by(unpaid_day))
+        for day, count in db.session.execute(orphans):
+            bucket(day)["paid_reports"] += count
+
+    db.session.execute(delete(DailyStats))
+    db.session.execute(delete(StatsTotals))
+    db.session.add_all([DailyStats(day=_as_date(day), **values) for day, values in daily.items() if day])
+    db.session.add(StatsTotals(
+        id=TOTALS_ID,
+        users=totals["total_users"],
+        reports=totals["total_reports"],
+        paid_reports=totals["paid_reports"],
+        revenue=totals["total_revenue"]
+    ))
+    db.session.commit()
+
+def _as_date(value):
+    # SQLite returns CAST(... AS DATE) as a string
+    if isinstance(value, str):
+        return datetime.strptime(value[:10], "%Y-%m-%d").date()
+    return value
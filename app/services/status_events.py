@@ -0,0 +1,74 @@
+"""
+STATUS CHANGE STREAMS
+Server-sent event streams for upload jobs and reports, so clients can wait
+for a change without polling the full JSON endpoints.
+
+Writers call notify() after committing a status change. This wakes every
+open stream in the process, and each stream reloads its small state row and
+emits an event only if something changed. Changes committed by another
+process (a separate worker, another gunicorn worker) are picked up by a
+fallback re-check every STATUS_STREAM_POLL seconds. Streams end after
+STATUS_STREAM_TIMEOUT seconds; EventSource then reconnects on its own.
+"""
+
+import os
+import json
+import time
+import threading
+from models import db
+
+POLL_INTERVAL = float(os.getenv('STATUS_STREAM_POLL', 5))
+STREAM_TIMEOUT = float(os.getenv('STATUS_STREAM_TIMEOUT', 30))
+RETRY_MS = 2000
+
+_condition = threading.Condition()
+_sequence = 0
+
+def notify():
+    """
+    Signals that some job or report status was committed.
+    """
+    global _sequence
+    with _condition:
+        _sequence += 1
+        _condition.notify_all()
+
+def _wait(seen, timeout):
+    with _condition:
+        _condition.wait_for(lambda: _sequence != seen, timeout)
+        return _sequence
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def stream_changes(load, event, is_final, timeout=None):
+    """
+    Generator of SSE messages. `load()` returns a small JSON-able state dict,
+    or None once the resource is gone. A message is sent for the initial
+    state and for every change after it; the stream closes on a final state.
+    """
+    deadline = time.monotonic() + (timeout or STREAM_TIMEOUT)
+    yield f"retry: {RETRY_MS}\n\n"
+
+    last = None
+    while True:
+        seen = _sequence
+        state = load()
+        # Never hold a pooled connection while waiting
+        db.session.close()
+
+        if state is None:
+            yield format_event("gone", {})
+            return
+        if state != last:
+            yield format_event(event, state)
+            last = state
+        if is_final(state):
+            return
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        if _wait(seen, min(POLL_INTERVAL, remaining)) == seen:
+            # Heartbeat comment so dead connections are noticed
+            yield ": keepalive\n\n"
@@ -0,0 +1,212 @@
+"""
+STRIPE WEBHOOK INBOX
+The webhook endpoint only verifies the signature, stores the event keyed by
+its Stripe event id and acknowledges. Redeliveries and retries hit the
+primary key and are dropped on arrival.
+
+A background consumer applies pending events in batches, one database
+transaction per batch, and makes a single stats increment per batch.
+Applying is idempotent at every step:
+- a report is flipped to paid with a conditional UPDATE, so it is counted once;
+- payments are unique per payment intent, so revenue is recorded once.
+
+If a batch fails, its events are retried one at a time, so a single bad
+event can't block the rest. After STRIPE_EVENT_MAX_ATTEMPTS failures an
+event is parked as "failed".
+"""
+
+import os
+import logging
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Report, Payment, StripeEvent
+from app.services import stats_service, score_distribution, metrics
+from app.services.status_events import notify
+from app.services.job_queue import enqueue
+
+BATCH_SIZE = int(os.getenv('STRIPE_EVENT_BATCH_SIZE', 200))
+MAX_ATTEMPTS = int(os.getenv('STRIPE_EVENT_MAX_ATTEMPTS', 5))
+
+logger = logging.getLogger("finhealth.stripe")
+
+def _insert_ignore(model, values, key):
+    """
+    INSERT that silently skips rows whose `key` already exists.
+    Returns True if the row was inserted.
+    """
+    table = model.__table__
+    dialect = db.session.connection().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values(**values).on_conflict_do_nothing(index_elements=[key])
+        return db.session.execute(stmt).rowcount == 1
+
+    if db.session.execute(select(table.c[key]).where(table.c[key] == values[key])).first():
+        return False
+    db.session.execute(table.insert().values(**values))
+    return True
+
+def record_event(event_id, event_type, payload):
+    """
+    Persists a verified webhook event. Returns False for a duplicate delivery.
+    """
+    inserted = _insert_ignore(StripeEvent, {
+        "id": event_id,
+        "type": event_type,
+        "payload": payload,
+        "status": "pending",
+        "attempts": 0,
+        "received_at": datetime.utcnow()
+    }, "id")
+    db.session.commit()
+    return inserted
+
+# --- Event handlers -------------------------------------------------------
+
+def _checkout_completed(session, effects):
+    report_id = (session.get('metadata') or {}).get('report_id')
+    if not report_id:
+        return
+    report_id = int(report_id)
+    report = db.session.execute(
+        select(Report.risk_score, Report.created_at).where(Report.id == report_id)
+    ).first()
+    if report is None:
+        return
+
+    marked = db.session.execute(
+        update(Report)
+        .where(Report.id == report_id, Report.paid.is_not(True))
+        .values(paid=True, updated_at=datetime.utcnow(),
+                percentile=score_distribution.percentiles_for(report.risk_score, report.created_at))
+    ).rowcount
+    if marked:
+        effects["paid_reports"] += 1
+        effects["newly_paid"].append(report_id)
+
+    amount = (session.get('amount_total') or 0) / 100
+    recorded = _insert_ignore(Payment, {
+        "report_id": report_id,
+        # Sessions without a payment intent are keyed by the session id
+        "stripe_payment_intent_id": session.get('payment_intent') or session.get('id'),
+        "amount": amount,
+        "status": "completed",
+        "created_at": datetime.utcnow()
+    }, "stripe_payment_intent_id")
+    if recorded:
+        effects["revenue"] += amount
+
+HANDLERS = {
+    'checkout.session.completed': _checkout_completed,
+}
+
+# --- Consumer -------------------------------------------------------------
+
+def _apply(events):
+    effects = {"paid_reports": 0, "revenue": 0.0, "newly_paid": []}
+    now = datetime.utcnow()
+    for event in events:
+        handler = HANDLERS.get(event.type)
+        if handler is not None:
+            handler(event.payload['data']['object'], effects)
+        event.status = "processed" if handler is not None else "ignored"
+        event.attempts += 1
+        event.error = None
+        event.processed_at = now
+    stats_service.record(paid_reports=effects["paid_reports"], revenue=effects["revenue"])
+    return effects["newly_paid"]
+
+def _apply_one_by_one(event_ids):
+    newly_paid = []
+    for event_id in event_ids:
+        event = db.session.get(StripeEvent, event_id)
+        if event is None or event.status != "pending":
+            continue
+        try:
+            newly_paid += _apply([event])
+            db.session.commit()
+        except Exception as e:
+            logger.exception("Stripe event %s failed to apply", event_id)
+            metrics.errors.inc(component="stripe_webhook")
+            db.session.rollback()
+            event = db.session.get(StripeEvent, event_id)
+            event.attempts += 1
+            event.error = str(e)
+            if event.attempts >= MAX_ATTEMPTS:
+                event.status = "failed"
+            db.session.commit()
+    return newly_paid
+
+def process_pending_events(batch_size=None):
+    """
+    Applies pending events oldest first until none are left.
+    Returns the number of events handled.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    handled = 0
+    while True:
+        # Concurrent consumers on PostgreSQL skip each other's rows
+        events = db.session.execute(
+            select(StripeEvent)
+            .where(StripeEvent.status == "pending")
+            .order_by(StripeEvent.received_at, StripeEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not events:
+            return handled
+
+        event_ids = [event.id for event in events]
+        try:
+            newly_paid = _apply(events)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            newly_paid = _apply_one_by_one(event_ids)
+        handled += len(event_ids)
+
+        if newly_paid:
+            notify()
+            for report_id in newly_paid:
+                # Render the PDF now so the first download is a cache hit
+                enqueue('app.services.pdf_cache:pregenerate_report_pdf', report_id)
+
+# --- Scheduling -----------------------------------------------------------
+
+_lock = threading.Lock()
+_scheduled = False
+_rerun = False
+
+def schedule_processing():
+    """
+    Makes sure a consumer runs soon. A burst of webhooks coalesces into one
+    running consumer plus at most one follow-up run.
+    """
+    global _scheduled, _rerun
+    with _lock:
+        if _scheduled:
+            _rerun = True
+            return
+        _scheduled = True
+        _rerun = False
+
+    app = current_app._get_current_object()
+    job = enqueue('app.services.stripe_events:process_pending_events')
+    if hasattr(job, 'add_done_callback'):
+        job.add_done_callback(lambda _: _finished(app))
+    else:
+        # Remote queues (rq): each webhook schedules its own run
+        _finished(None)
+
+def _finished(app):
+    global _scheduled
+    with _lock:
+        _scheduled = False
+        rerun = _rerun
+    if rerun and app is not None:
+        with app.app_context():
+            schedule_processing()
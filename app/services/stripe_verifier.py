@@ -0,0 +1,213 @@
+"""
+STRIPE SESSION VERIFICATION
+Checks whether a Checkout Session paid for a given report, for the
+success-page fallback in get_report, without letting Stripe latency leak
+into report reads. A session only counts for the report named in its
+metadata, so a paid session id can't unlock any other report.
+
+- Results are cached per (session, report): paid is final and kept for an
+  hour, unpaid is re-checked after STRIPE_VERIFY_TTL seconds.
+- Single flight: concurrent polls for the same session and report share
+  one outbound call instead of each making their own.
+- Every call has an explicit STRIPE_VERIFY_TIMEOUT and no SDK retries.
+- A circuit breaker opens after STRIPE_BREAKER_THRESHOLD consecutive
+  failures and short-circuits calls for STRIPE_BREAKER_COOLDOWN seconds,
+  then lets a single trial call through.
+
+STRIPE_API_BASE points the client at a fake Stripe server for local testing.
+"""
+
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future, TimeoutError as FutureTimeout
+from app.services import metrics
+from app.services.stripe_service import get_stripe
+
+CACHE_TTL = float(os.getenv('STRIPE_VERIFY_TTL', 5))
+PAID_TTL = 3600
+REQUEST_TIMEOUT = float(os.getenv('STRIPE_VERIFY_TIMEOUT', 5))
+BREAKER_THRESHOLD = int(os.getenv('STRIPE_BREAKER_THRESHOLD', 5))
+BREAKER_COOLDOWN = float(os.getenv('STRIPE_BREAKER_COOLDOWN', 30))
+MAX_WORKERS = int(os.getenv('STRIPE_VERIFY_WORKERS', 4))
+MAX_CACHE_ENTRIES = 10000
+
+logger = logging.getLogger("finhealth.stripe")
+
+class CircuitBreaker:
+    """
+    closed -> open after `threshold` consecutive failures; open -> half-open
+    once `cooldown` has passed, where one trial call decides which way to go.
+    """
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+
+_client = None
+_executor = None
+_lock = threading.Lock()
+_cache = {}
+_in_flight = {}
+_watched = set()
+
+def _get_client():
+    global _client
+    if _client is None:
+        stripe = get_stripe()
+        base = os.getenv('STRIPE_API_BASE')
+        _client = stripe.StripeClient(
+            os.getenv('STRIPE_SECRET_KEY') or '',
+            http_client=stripe.new_default_http_client(timeout=REQUEST_TIMEOUT),
+            base_addresses={"api": base} if base else None,
+            max_network_retries=0
+        )
+    return _client
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="stripe-verify")
+    return _executor
+
+def _fetch(session_id, report_id):
+    """
+    One outbound call. Returns True if the session is paid and was created
+    for `report_id`, False otherwise, or None when Stripe couldn't be
+    reached (the breaker counts those).
+    """
+    try:
+        with metrics.external_call(metrics.stripe_duration, metrics.stripe_requests, operation="retrieve_session"):
+            session = _get_client().v1.checkout.sessions.retrieve(session_id)
+    except get_stripe().InvalidRequestError:
+        # Unknown session id: a definitive "not paid", not an outage
+        breaker.record_success()
+        return False
+    except Exception:
+        logger.exception("Stripe session retrieval failed for %s", session_id)
+        metrics.errors.inc(component="stripe_verify")
+        breaker.record_failure()
+        return None
+    breaker.record_success()
+    metadata = session.metadata or {}
+    paid_for = metadata['report_id'] if 'report_id' in metadata else None
+    return session.payment_status == 'paid' and str(paid_for) == str(report_id)
+
+def _finish(key, future):
+    paid = future.result() if not future.cancelled() else None
+    with _lock:
+        _in_flight.pop(key, None)
+        if paid is not None:
+            if len(_cache) >= MAX_CACHE_ENTRIES:
+                _prune()
+            _cache[key] = (time.monotonic() + (PAID_TTL if paid else CACHE_TTL), paid)
+
+def verify_session_async(session_id, report_id):
+    """
+    Returns a Future resolving to True (paid for this report), False (not
+    paid, or paid for another report) or None (Stripe unavailable or
+    circuit open). Cached results resolve immediately and concurrent
+    callers for one session and report share a single call.
+    """
+    key = (session_id, report_id)
+    with _lock:
+        cached = _cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return _resolved(cached[1])
+        future = _in_flight.get(key)
+        if future is not None:
+            return future
+        if not breaker.allow():
+            return _resolved(None)
+        future = _get_executor().submit(_fetch, session_id, report_id)
+        _in_flight[key] = future
+    future.add_done_callback(lambda f: _finish(key, f))
+    return future
+
+def verify_session(session_id, report_id, wait=None):
+    """
+    Blocking variant: waits up to `wait` seconds (default: the request
+    timeout) and returns None if the answer isn't in by then.
+    """
+    future = verify_session_async(session_id, report_id)
+    try:
+        return future.result(timeout=REQUEST_TIMEOUT if wait is None else wait)
+    except FutureTimeout:
+        return None
+
+def when_paid(session_id, report_id, future, callback):
+    """
+    Runs `callback()` on the verification thread once `future` resolves as
+    paid. Registered at most once per session and report while the call is
+    in flight.
+    """
+    key = (session_id, report_id)
+    with _lock:
+        if key in _watched:
+            return
+        _watched.add(key)
+
+    def _done(f):
+        with _lock:
+            _watched.discard(key)
+        if not f.cancelled() and f.result():
+            callback()
+
+    future.add_done_callback(_done)
+
+def _prune():
+    now = time.monotonic()
+    for key in [k for k, (expires, _) in _cache.items() if expires <= now]:
+        del _cache[key]
+    if len(_cache) >= MAX_CACHE_ENTRIES:
+        _cache.clear()
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+def reset():
+    """
+    Clears cached results and closes the breaker.
+    """
+    with _lock:
+        _cache.clear()
+    breaker.record_success()
@@ -0,0 +1,161 @@
+"""
+MONTHLY ROLLUPS & TIME-SERIES METRICS
+Ingestion reduces transactions to one compact row per report and calendar
+month: income and expense totals, income deposit count and per-category
+spend. A multi-year history is then a few dozen rows, and the time-series
+metrics below run over those arrays instead of the raw transactions:
+
+1. Income CV: standard deviation / mean of monthly income. Steady
+   paychecks give a CV near 0, irregular income a CV near or above 1.
+2. Expense trend: slope of a least-squares line through monthly expenses,
+   relative to the mean (+0.05 = spending grows ~5% of a typical month per
+   month).
+3. Rolling savings rate: (income - expenses) / income over a trailing
+   ROLLING_MONTHS window.
+
+Months without transactions between the first and last month count as
+zero, so gaps in income lower stability as they should.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+
+ROLLING_MONTHS = int(os.getenv('ROLLING_SAVINGS_MONTHS', 3))
+
+# Histories shorter than this fall back to the deposit-count stability proxy
+MIN_MONTHS_FOR_STABILITY = 3
+
+def _empty_month():
+    return {"income_total": 0.0, "expense_total": 0.0, "income_count": 0, "category_breakdown": {}}
+
+def _key(value):
+    return value.item() if hasattr(value, 'item') else value
+
+def monthly_rollups_batch(frame):
+    """
+    frame: DataFrame with `report_id`, `date`, `amount` and `category`.
+    Returns {report_id: {month (date, 1st of month): rollup}} where a rollup
+    holds income_total, expense_total, income_count and category_breakdown.
+    """
+    result = {}
+    if frame.empty:
+        return result
+
+    amounts = frame['amount'].to_numpy(dtype=np.float64)
+    months = pd.to_datetime(frame['date']).to_numpy().astype('datetime64[M]')
+    # Uncategorized rows are shown as Misc, like risk_engine
+    categories = frame['category'].where(frame['category'].notna() & (frame['category'] != ""), "Misc")
+
+    keys = pd.DataFrame({
+        'report_id': frame['report_id'].to_numpy(),
+        'month': months,
+        'income': np.where(amounts > 0, amounts, 0.0),
+        'expense': np.where(amounts < 0, -amounts, 0.0),
+        'deposit': (amounts > 0).astype(np.int64),
+        'magnitude': np.abs(amounts),
+        'category': categories.to_numpy(dtype=object)
+    })
+
+    totals = keys.groupby(['report_id', 'month'], sort=True)[['income', 'expense', 'deposit']].sum()
+    for (report_id, month), income, expense, deposits in zip(
+            totals.index, totals['income'].tolist(), totals['expense'].tolist(), totals['deposit'].tolist()):
+        entry = result.setdefault(_key(report_id), {}).setdefault(pd.Timestamp(month).date(), _empty_month())
+        entry.update(income_total=income, expense_total=expense, income_count=int(deposits))
+
+    breakdown = keys.groupby(['report_id', 'month', 'category'], sort=False)['magnitude'].sum()
+    for (report_id, month, category), amount in zip(breakdown.index, breakdown.tolist()):
+        result[_key(report_id)][pd.Timestamp(month).date()]["category_breakdown"][category] = amount
+    return result
+
+def monthly_rollups(frame):
+    """
+    Single-report form of monthly_rollups_batch: {month: rollup}.
+    """
+    if frame.empty:
+        return {}
+    return monthly_rollups_batch(frame.assign(report_id=0)).get(0, {})
+
+def merge_rollups(base, delta):
+    """
+    Adds the rollups of new transactions to existing ones. Returns a new dict.
+    """
+    merged = {month: dict(entry, category_breakdown=dict(entry["category_breakdown"]))
+              for month, entry in base.items()}
+    for month, entry in delta.items():
+        target = merged.setdefault(month, _empty_month())
+        target["income_total"] += entry["income_total"]
+        target["expense_total"] += entry["expense_total"]
+        target["income_count"] += entry["income_count"]
+        for category, amount in entry["category_breakdown"].items():
+            target["category_breakdown"][category] = target["category_breakdown"].get(category, 0.0) + amount
+    return merged
+
+def _series(rollups):
+    """
+    Dense monthly arrays from the first to the last month with data.
+    """
+    months = sorted(rollups)
+    first = np.datetime64(months[0], 'M')
+    last = np.datetime64(months[-1], 'M')
+    calendar = np.arange(first, last + 1, dtype='datetime64[M]')
+    index = {month: i for i, month in enumerate(calendar.astype('datetime64[D]').astype(object))}
+
+    income = np.zeros(len(calendar))
+    expense = np.zeros(len(calendar))
+    positions = np.array([index[month] for month in months])
+    income[positions] = [rollups[month]["income_total"] for month in months]
+    expense[positions] = [rollups[month]["expense_total"] for month in months]
+    return calendar, income, expense
+
+def _trailing_sums(values, window):
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums
+
+def rolling_savings_rate(income, expense, window=None):
+    """
+    Savings rate over each trailing `window`-month span (shorter at the
+    start). NaN where the window has no income.
+    """
+    window = window or ROLLING_MONTHS
+    income_sums = _trailing_sums(income, window)
+    expense_sums = _trailing_sums(expense, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(income_sums > 0, (income_sums - expense_sums) / income_sums, np.nan)
+
+def income_cv(income):
+    mean = income.mean() if len(income) else 0.0
+    if len(income) < 2 or mean <= 0:
+        return None
+    return float(income.std() / mean)
+
+def expense_trend(expense):
+    mean = expense.mean() if len(expense) else 0.0
+    if len(expense) < 2 or mean <= 0:
+        return None
+    slope = np.polyfit(np.arange(len(expense), dtype=np.float64), expense, 1)[0]
+    return float(slope / mean)
+
+def series_metrics(rollups):
+    """
+    Time-series metrics for one report's rollups ({month: rollup}).
+    """
+    if not rollups:
+        return {"months": 0, "income_cv": None, "expense_trend": None, "savings_rate_rolling": None, "monthly": []}
+
+    calendar, income, expense = _series(rollups)
+    rolling = rolling_savings_rate(income, expense)
+    labels = [str(month) for month in calendar]
+    return {
+        "months": len(calendar),
+        "income_cv": income_cv(income),
+        "expense_trend": expense_trend(expense),
+        "savings_rate_rolling": None if np.isnan(rolling[-1]) else float(rolling[-1]),
+        "monthly": [{
+            "month": label,
+            "income": float(inc),
+            "expenses": float(exp),
+            "savings_rate": None if np.isnan(rate) else round(float(rate), 2)
+        } for label, inc, exp, rate in zip(labels, income, expense, rolling)]
+    }
@@ -0,0 +1,111 @@
+"""
+BULK TRANSACTION PERSISTENCE
+Writes categorized chunks to the `transaction` table in batches using Core
+executemany (or COPY on PostgreSQL) on the session's connection, so the rows
+join the caller's database transaction instead of committing per batch.
+"""
+
+import io
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from models import db, Transaction
+
+DEFAULT_BATCH_SIZE = int(os.getenv('TRANSACTION_BATCH_SIZE', 5000))
+MAX_REJECTED_SAMPLES = 100
+
+COLUMNS = ['report_id', 'date', 'description', 'amount', 'category']
+
+class TransactionWriter:
+    def __init__(self, report_id, batch_size=None):
+        self.report_id = report_id
+        self.batch_size = batch_size or DEFAULT_BATCH_SIZE
+        self.count = 0
+        self._pending = []
+        self._pending_rows = 0
+        connection = db.session.connection()
+        self._use_copy = (
+            connection.dialect.name == 'postgresql'
+            and connection.dialect.driver in ('psycopg2', 'psycopg')
+            and os.getenv('TRANSACTION_COPY', 'true').lower() == 'true'
+        )
+
+    def write(self, chunk):
+        """
+        chunk: DataFrame with date, description, amount and category columns.
+        """
+        frame = chunk[['date', 'description', 'amount', 'category']].copy()
+        frame.insert(0, 'report_id', self.report_id)
+        frame['date'] = frame['date'].dt.date
+
+        # Split oversized chunks so a single statement never exceeds a batch
+        for start in range(0, len(frame), self.batch_size):
+            part = frame.iloc[start:start + self.batch_size]
+            self._pending.append(part)
+            self._pending_rows += len(part)
+            if self._pending_rows >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        frame = pd.concat(self._pending) if len(self._pending) > 1 else self._pending[0]
+        self._pending = []
+        self._pending_rows = 0
+
+        if self._use_copy:
+            self._copy(frame)
+        else:
+            rows = [dict(zip(COLUMNS, values)) for values in zip(*(frame[c].tolist() for c in COLUMNS))]
+            db.session.execute(insert(Transaction.__table__), rows)
+        self.count += len(frame)
+
+    def _copy(self, frame):
+        buffer = io.StringIO()
+        frame.to_csv(buffer, columns=COLUMNS, header=False, index=False)
+        buffer.seek(0)
+
+        table = Transaction.__table__.name
+        sql = f'COPY "{table}" ({", ".join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)'
+        dbapi_connection = db.session.connection().connection.driver_connection
+        with dbapi_connection.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):
+                # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:
+                # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+class RejectedRows:
+    """
+    Collects rows that failed parsing. Keeps the total count plus a bounded
+    sample of row numbers and reasons for the job status report.
+    """
+    def __init__(self, max_samples=MAX_REJECTED_SAMPLES):
+        self.max_samples = max_samples
+        self.count = 0
+        self.samples = []
+
+    def collect(self, chunk):
+        invalid = chunk[~chunk['valid']]
+        if invalid.empty:
+            return
+        self.count += len(invalid)
+
+        room = self.max_samples - len(self.samples)
+        if room <= 0:
+            return
+        invalid = invalid.iloc[:room]
+        reasons = np.select(
+            [invalid['date'].isna(), invalid['amount'].isna(), invalid['description'].isna()],
+            ["invalid date", "invalid amount", "missing description"],
+            default="invalid row"
+        )
+        # +2: one for the header line, one for 1-based line numbers
+        for index, reason in zip(invalid.index, reasons):
+            self.samples.append({"row": int(index) + 2, "reason": str(reason)})
+
+    def to_dict(self):
+        return {"count": self.count, "rows": self.samples}
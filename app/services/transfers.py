@@ -0,0 +1,72 @@
+"""
+INTERNAL TRANSFER MATCHING
+When one customer uploads several accounts, money moved between them shows
+up twice: as an outflow on one statement and an inflow on another. Counted
+in a consolidated report it inflates both income and expenses.
+
+A transfer pair is an outflow and an inflow that:
+- belong to different accounts,
+- have exactly the same amount (to the cent),
+- are at most TRANSFER_WINDOW_DAYS apart, and
+- have a transfer-like description on at least one side ("TRANSFER",
+  "XFER", "PAYMENT THANK YOU", ...). This keeps rent paid and salary
+  received on the same day from cancelling out.
+
+Each row joins at most one pair. Pairs are matched closest date first.
+"""
+
+import os
+import pandas as pd
+
+WINDOW_DAYS = int(os.getenv('TRANSFER_WINDOW_DAYS', 3))
+
+TRANSFER_PATTERN = (
+    r'TRANSFER|\bXFER\b|\bTFR\b|\bTRNSFR\b|ZELLE|PAYMENT\s+THANK\s+YOU|AUTOPAY|'
+    r'CARD\s+(?:PMT|PAYMENT)|ONLINE\s+(?:PMT|PAYMENT)|\bTO\s+SAVINGS\b|\bFROM\s+(?:CHECKING|SAVINGS)\b'
+)
+
+def find_transfers(frame, window_days=None):
+    """
+    frame: DataFrame with `account`, `date`, `description` and `amount`
+    columns and a unique index. Returns a boolean Series (aligned to the
+    frame) that is True for both legs of every matched transfer.
+    """
+    window = pd.Timedelta(days=WINDOW_DAYS if window_days is None else window_days)
+    matched = pd.Series(False, index=frame.index)
+    if frame.empty or frame['account'].nunique() < 2:
+        return matched
+
+    cents = (frame['amount'] * 100).round().astype('int64')
+    rows = pd.DataFrame({
+        'row': frame.index,
+        'account': frame['account'].to_numpy(),
+        'date': frame['date'].to_numpy(),
+        'key': cents.abs().to_numpy(),
+        'keyword': frame['description'].astype(str).str.contains(TRANSFER_PATTERN, case=False, regex=True).to_numpy()
+    })
+    outflows = rows[cents.to_numpy() < 0]
+    inflows = rows[cents.to_numpy() > 0]
+
+    # Join keyword rows against everything on the other side, rather than
+    # all outflows against all inflows: common amounts would blow up the join
+    pairs = pd.concat([
+        outflows[outflows['keyword']].merge(inflows, on='key', suffixes=('_out', '_in')),
+        outflows[~outflows['keyword']].merge(inflows[inflows['keyword']], on='key', suffixes=('_out', '_in'))
+    ], ignore_index=True)
+    if pairs.empty:
+        return matched
+
+    pairs['gap'] = (pairs['date_out'] - pairs['date_in']).abs()
+    pairs = pairs[(pairs['account_out'] != pairs['account_in']) & (pairs['gap'] <= window)]
+    pairs = pairs.sort_values(['gap', 'date_out', 'row_out', 'row_in'], kind='stable')
+
+    used = set()
+    for row_out, row_in in zip(pairs['row_out'].tolist(), pairs['row_in'].tolist()):
+        if row_out in used or row_in in used:
+            continue
+        used.add(row_out)
+        used.add(row_in)
+
+    if used:
+        matched.loc[sorted(used)] = True
+    return matched
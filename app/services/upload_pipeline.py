@@ -0,0 +1,599 @@
+import os
+import uuid
+import shutil
+import zipfile
+import tempfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import update
+from models import db, User, Report, UploadJob
+from app.services.job_queue import enqueue
+from app.services import stats_service, metrics, score_distribution
+from app.services.status_events import notify
+
+STAGES = ["parse", "categorize", "persist", "score"]
+
+BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 20))
+BATCH_MAX_BYTES = int(os.getenv('BATCH_MAX_MB', 200)) * 1024 * 1024
+BATCH_WORKERS = int(os.getenv('BATCH_FILE_WORKERS', 4))
+# Tries an append gets when other appends to the same report keep winning
+APPEND_ATTEMPTS = 3
+
+TRANSACTION_COLUMNS = ['date', 'description', 'amount', 'category']
+
+# Batch-level details that scoring can't rebuild from the transactions
+PRESERVED_SUMMARY_KEYS = ("accounts", "transfers")
+
+def _spool_dir():
+    path = os.getenv('UPLOAD_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'finhealth_uploads'))
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def check_appendable(report_id, email):
+    """
+    Raises ValueError unless `email` owns the report and it can take appends.
+    """
+    report = db.session.get(Report, report_id)
+    if report is None or report.user.email != email:
+        raise ValueError("Report not found for this email")
+    if report.parent_id is not None or report.accounts:
+        raise ValueError("Multi-account reports can't be appended to; upload the batch again")
+    return report
+
+def submit_upload(file, email, report_id=None):
+    """
+    Spools the uploaded CSV to disk, records a queued job and hands it to the
+    background worker pool. With `report_id`, the statement is appended to
+    that report instead of creating a new one. Returns the UploadJob.
+    """
+    if report_id is not None:
+        check_appendable(report_id, email)
+
+    job_id = str(uuid.uuid4())
+    path = os.path.join(_spool_dir(), f"{job_id}.csv")
+    file.save(path)
+
+    job = UploadJob(
+        id=job_id,
+        email=email,
+        filename=file.filename,
+        status="queued",
+        stages={stage: {"status": "pending"} for stage in STAGES},
+        report_id=report_id
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    task = 'run_upload_job' if report_id is None else 'run_append_job'
+    enqueue(f'app.services.upload_pipeline:{task}', job_id, path)
+    return job
+
+def _account_name(filename, taken):
+    name = os.path.splitext(os.path.basename(filename or ""))[0].strip() or "Account"
+    candidate, n = name, 2
+    while candidate in taken:
+        candidate = f"{name} ({n})"
+        n += 1
+    taken.add(candidate)
+    return candidate
+
+def _copy_limited(source, path, budget):
+    # Counts real bytes, so a zip that understates its sizes can't exceed the cap
+    written = 0
+    with open(path, 'wb') as target:
+        while True:
+            block = source.read(1024 * 1024)
+            if not block:
+                return written
+            written += len(block)
+            if written > budget:
+                raise ValueError(f"Batch exceeds {BATCH_MAX_BYTES // (1024 * 1024)} MB")
+            target.write(block)
+
+def _spool_batch(files, directory):
+    """
+    Writes every CSV of the upload to `directory` as 0.csv, 1.csv, ... Plain
+    CSV parts are taken as they are; zip archives contribute each .csv
+    member. Returns [{"name", "filename"}] in file order.
+    """
+    sources = []
+    archives = []
+    try:
+        for file in files:
+            if not file.filename.lower().endswith('.zip'):
+                sources.append((file.filename, None, file.stream))
+                continue
+            try:
+                archive = zipfile.ZipFile(file.stream)
+            except zipfile.BadZipFile:
+                raise ValueError(f"{file.filename} is not a valid zip archive")
+            archives.append(archive)
+            for member in archive.infolist():
+                base = os.path.basename(member.filename)
+                if member.is_dir() or not base.lower().endswith('.csv') or base.startswith('.') \
+                        or member.filename.startswith('__MACOSX/'):
+                    continue
+                sources.append((base, archive, member))
+
+        if not sources:
+            raise ValueError("No CSV files found in the upload")
+        if len(sources) > BATCH_MAX_FILES:
+            raise ValueError(f"A batch can contain at most {BATCH_MAX_FILES} files")
+
+        accounts = []
+        taken = set()
+        budget = BATCH_MAX_BYTES
+        for index, (filename, archive, source) in enumerate(sources):
+            path = os.path.join(directory, f"{index}.csv")
+            if archive is None:
+                budget -= _copy_limited(source, path, budget)
+            else:
+                with archive.open(source) as stream:
+                    budget -= _copy_limited(stream, path, budget)
+            accounts.append({"name": _account_name(filename, taken), "filename": filename})
+        return accounts
+    finally:
+        for archive in archives:
+            archive.close()
+
+def submit_batch_upload(files, email):
+    """
+    Spools a multi-account upload (several CSVs and/or zip archives) and
+    queues one job for it. Raises ValueError for unusable uploads.
+    """
+    job_id = str(uuid.uuid4())
+    directory = os.path.join(_spool_dir(), job_id)
+    os.makedirs(directory)
+    try:
+        accounts = _spool_batch(files, directory)
+    except Exception:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    job = UploadJob(
+        id=job_id,
+        email=email,
+        filename=", ".join(a["filename"] for a in accounts)[:255],
+        status="queued",
+        stages={stage: {"status": "pending"} for stage in STAGES},
+        accounts=[dict(account, status="pending") for account in accounts]
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    enqueue('app.services.upload_pipeline:run_batch_job', job_id, directory)
+    return job
+
+def job_to_dict(job):
+    return {
+        "id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "stages": job.stages,
+        "report_id": job.report_id,
+        "error": job.error,
+        "rows_saved": job.rows_saved,
+        "rejected_rows": job.rejected_rows,
+        "accounts": job.accounts,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None
+    }
+
+def _set_stage(job, stage, status, **extra):
+    stages = dict(job.stages or {})
+    entry = dict(stages.get(stage, {}))
+    entry["status"] = status
+    entry[f"{status}_at"] = datetime.utcnow().isoformat()
+    entry.update(extra)
+    stages[stage] = entry
+    # Reassign so SQLAlchemy picks up the JSON change
+    job.stages = stages
+    job.stage = stage
+
+def _mark(job, stages, status):
+    for stage in stages:
+        _set_stage(job, stage, status)
+
+def run_upload_job(job_id, path):
+    """
+    Worker entry point: streams parse -> categorize -> persist chunk by chunk,
+    then scores the report.
+    """
+    # The data stack (pandas, the LLM client) loads in the worker on first
+    # use, so web workers that only accept uploads never import it
+    import pandas as pd
+    from app.services.ai_service import categorize_descriptions
+    from app.services.csv_ingest import iter_transaction_chunks
+    from app.services.transaction_writer import TransactionWriter, RejectedRows
+    from app.services.timeseries import monthly_rollups, merge_rollups
+    from app.services.report_aggregates import store_rollups
+
+    job = db.session.get(UploadJob, job_id)
+    if job is None:
+        return
+
+    # Streaming stages overlap (each chunk flows parse -> categorize -> persist)
+    stream_stages = ["parse", "categorize", "persist"]
+
+    try:
+        chunks = iter_transaction_chunks(path)
+
+        job.status = "running"
+        _mark(job, stream_stages, "running")
+        db.session.commit()
+        notify()
+
+        # The report, its transactions and the summary land in one transaction
+        report = create_report(job.email)
+        writer = TransactionWriter(report.id)
+        rejected = RejectedRows()
+
+        scored = []
+        rollups = {}
+        for chunk in metrics.timed_iter("parse", chunks):
+            rejected.collect(chunk)
+            chunk = chunk[chunk['valid']].copy()
+            with metrics.timed("categorize", rows=len(chunk)):
+                chunk['category'] = categorize_descriptions(chunk['description'].tolist())
+            with metrics.timed("insert", rows=len(chunk)):
+                writer.write(chunk)
+            with metrics.timed("rollup", rows=len(chunk)):
+                rollups = merge_rollups(rollups, monthly_rollups(chunk))
+            # Only the columns scoring needs are kept across chunks
+            scored.append(chunk[['amount', 'category']])
+        with metrics.timed("insert"):
+            writer.flush()
+            store_rollups(report.id, rollups)
+        _mark(job, stream_stages, "completed")
+
+        _mark(job, ["score"], "running")
+        frame = pd.concat(scored) if scored else pd.DataFrame(columns=['amount', 'category'])
+        with metrics.timed("score", rows=len(frame)):
+            score_report(report, frame, rollups)
+        _mark(job, ["score"], "completed")
+
+        job.report_id = report.id
+        job.rows_saved = writer.count
+        job.rejected_rows = rejected.to_dict()
+        job.status = "completed"
+        db.session.commit()
+        notify()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(UploadJob, job_id)
+        if job.stage:
+            _set_stage(job, job.stage, "failed")
+        job.status = "failed"
+        job.error = str(e)
+        db.session.commit()
+        notify()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+class AppendConflict(Exception):
+    """
+    Another append to the same report committed while this one ran.
+    """
+
+def run_append_job(job_id, path):
+    """
+    Worker entry point for append mode: merges a new statement into the
+    job's existing report. Rows the report already has are dropped before
+    categorization, and the score is rebuilt from the stored running
+    aggregates plus the new rows only, so the cost is O(new rows).
+
+    Appends to one report are serialized optimistically, which works the
+    same on SQLite (no row locks) and PostgreSQL: the job commits only if
+    the report's version is still the one it started from, and otherwise
+    starts over, deduplicating against the rows the other append added.
+    """
+    job = db.session.get(UploadJob, job_id)
+    if job is None:
+        return
+
+    try:
+        for _ in range(APPEND_ATTEMPTS):
+            try:
+                _append(job, path)
+                break
+            except AppendConflict:
+                db.session.rollback()
+                job = db.session.get(UploadJob, job_id)
+        else:
+            raise ValueError("The report kept changing during the append; try again")
+        notify()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(UploadJob, job_id)
+        if job.stage:
+            _set_stage(job, job.stage, "failed")
+        job.status = "failed"
+        job.error = str(e)
+        db.session.commit()
+        notify()
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+def _append(job, path):
+    """
+    One attempt of run_append_job. Raises AppendConflict, before
+    committing anything but the job's running state, if another append
+    got there first.
+    """
+    from app.services.ai_service import categorize_descriptions
+    from app.services.csv_ingest import iter_transaction_chunks
+    from app.services.transaction_writer import TransactionWriter, RejectedRows
+    from app.services.report_aggregates import TransactionDeduper, load_aggregates, store_rollups
+    from app.services.risk_engine import compute_aggregates, merge_aggregates
+    from app.services.timeseries import monthly_rollups, merge_rollups
+
+    stream_stages = ["parse", "categorize", "persist"]
+    chunks = iter_transaction_chunks(path)
+
+    job.status = "running"
+    _mark(job, stream_stages, "running")
+    db.session.commit()
+    notify()
+
+    report = db.session.get(Report, job.report_id)
+    version = report.version
+    aggregates = load_aggregates(report)
+    deduper = TransactionDeduper(report.id)
+    writer = TransactionWriter(report.id)
+    rejected = RejectedRows()
+    new_rollups = {}
+
+    for chunk in metrics.timed_iter("parse", chunks):
+        rejected.collect(chunk)
+        with metrics.timed("dedupe", rows=len(chunk)):
+            chunk = deduper.new_rows(chunk[chunk['valid']]).copy()
+        if chunk.empty:
+            continue
+        with metrics.timed("categorize", rows=len(chunk)):
+            chunk['category'] = categorize_descriptions(chunk['description'].tolist())
+        with metrics.timed("insert", rows=len(chunk)):
+            writer.write(chunk)
+        with metrics.timed("score", rows=len(chunk)):
+            aggregates = merge_aggregates(aggregates, compute_aggregates(chunk))
+        with metrics.timed("rollup", rows=len(chunk)):
+            new_rollups = merge_rollups(new_rollups, monthly_rollups(chunk))
+    with metrics.timed("insert"):
+        writer.flush()
+        # Only the months the new rows fall in are read and rewritten
+        store_rollups(report.id, new_rollups)
+    _mark(job, ["parse", "categorize"], "completed")
+    _set_stage(job, "persist", "completed", duplicates=deduper.duplicates)
+
+    _mark(job, ["score"], "running")
+    apply_aggregates(report, aggregates)
+    _mark(job, ["score"], "completed")
+
+    # Waits for a concurrent append's commit, then matches nothing if it won
+    claimed = db.session.execute(
+        update(Report)
+        .where(Report.id == report.id, Report.version == version)
+        .values(version=version + 1)
+    ).rowcount
+    if not claimed:
+        raise AppendConflict()
+
+    job.rows_saved = writer.count
+    job.rejected_rows = rejected.to_dict()
+    job.status = "completed"
+    db.session.commit()
+
+def _load_account(app, path):
+    """
+    Parses and categorizes one file of a batch on a pool thread, with its own
+    app context and session. Returns (frame, rejected rows, error message).
+    """
+    import pandas as pd
+    from app.services.ai_service import categorize_descriptions
+    from app.services.csv_ingest import iter_transaction_chunks
+    from app.services.transaction_writer import RejectedRows
+
+    with app.app_context():
+        try:
+            rejected = RejectedRows()
+            frames = []
+            chunks = iter_transaction_chunks(path)
+            # The cache entries this thread learns (the CSV schema, then each
+            # chunk's categories) are committed straight away: on SQLite an
+            # open write would hold the database lock through this thread's
+            # next LLM calls and time out the other files' writes
+            db.session.commit()
+            for chunk in metrics.timed_iter("parse", chunks):
+                rejected.collect(chunk)
+                chunk = chunk[chunk['valid']].copy()
+                with metrics.timed("categorize", rows=len(chunk)):
+                    chunk['category'] = categorize_descriptions(chunk['description'].tolist())
+                db.session.commit()
+                frames.append(chunk[TRANSACTION_COLUMNS])
+            frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=TRANSACTION_COLUMNS)
+            return frame, rejected.to_dict(), None
+        except Exception as e:
+            return None, None, str(e)
+        finally:
+            db.session.remove()
+
+def _write_transactions(report, frame):
+    """
+    Persists one report's rows and their monthly rollups. Returns
+    (rows written, rollups).
+    """
+    from app.services.transaction_writer import TransactionWriter
+    from app.services.timeseries import monthly_rollups
+    from app.services.report_aggregates import store_rollups
+    writer = TransactionWriter(report.id)
+    with metrics.timed("insert", rows=len(frame)):
+        if len(frame):
+            writer.write(frame)
+        writer.flush()
+    with metrics.timed("rollup", rows=len(frame)):
+        rollups = monthly_rollups(frame)
+        store_rollups(report.id, rollups)
+    return writer.count, rollups
+
+def run_batch_job(job_id, directory):
+    """
+    Worker entry point for multi-account uploads. Files are parsed and
+    categorized in parallel (BATCH_FILE_WORKERS threads; the LLM round trips
+    dominate and release the GIL), so the batch takes about as long as its
+    slowest file. Then, in one database transaction, every account gets its
+    own report and the consolidated parent report is scored over all
+    accounts with internal transfers removed.
+    """
+    import pandas as pd
+    from app.services.transfers import find_transfers
+
+    job = db.session.get(UploadJob, job_id)
+    if job is None:
+        return
+
+    try:
+        accounts = [dict(account) for account in job.accounts]
+        job.status = "running"
+        _mark(job, ["parse", "categorize"], "running")
+        db.session.commit()
+        notify()
+
+        app = current_app._get_current_object()
+        paths = [os.path.join(directory, f"{index}.csv") for index in range(len(accounts))]
+        with ThreadPoolExecutor(max_workers=max(1, min(BATCH_WORKERS, len(paths))),
+                                thread_name_prefix='batch-file') as pool:
+            loaded = list(pool.map(lambda path: _load_account(app, path), paths))
+        _mark(job, ["parse", "categorize"], "completed")
+
+        if all(error for _, _, error in loaded):
+            raise ValueError("; ".join(f"{a['name']}: {error}" for a, (_, _, error) in zip(accounts, loaded)))
+
+        _mark(job, ["persist"], "running")
+        parent = create_report(job.email)
+        children = []
+        frames = []
+        for index, (account, (frame, rejected, error)) in enumerate(zip(accounts, loaded)):
+            if error:
+                account.update(status="failed", error=error)
+                continue
+            report = create_report(job.email, parent=parent, account_name=account["name"])
+            rows_saved, rollups = _write_transactions(report, frame)
+            account.update(status="completed", report_id=report.id, rejected_rows=rejected, rows_saved=rows_saved)
+            children.append((report, frame, rollups))
+            frames.append(frame.assign(account=index))
+
+        merged = pd.concat(frames, ignore_index=True)
+        transfers = find_transfers(merged)
+        consolidated = merged[~transfers]
+        _, parent_rollups = _write_transactions(parent, consolidated[TRANSACTION_COLUMNS])
+        _mark(job, ["persist"], "completed")
+
+        _mark(job, ["score"], "running")
+        for report, frame, rollups in children:
+            with metrics.timed("score", rows=len(frame)):
+                score_report(report, frame[['amount', 'category']], rollups)
+        with metrics.timed("score", rows=len(consolidated)):
+            score_report(parent, consolidated[['amount', 'category']], parent_rollups)
+        inflows = merged['amount'][transfers & (merged['amount'] > 0)]
+        parent.summary_data = dict(
+            parent.summary_data,
+            accounts=[{
+                "name": report.account_name,
+                "report_id": report.id,
+                "risk_score": report.risk_score,
+                "total_income": report.total_income,
+                "total_expenses": report.total_expense
+            } for report, _, _ in children],
+            transfers={"count": len(inflows), "amount": float(inflows.sum())}
+        )
+        _mark(job, ["score"], "completed")
+
+        job.report_id = parent.id
+        job.accounts = accounts
+        job.rows_saved = sum(account.get("rows_saved", 0) for account in accounts)
+        job.rejected_rows = {
+            "count": sum(account["rejected_rows"]["count"] for account in accounts if account.get("rejected_rows")),
+            "rows": []
+        }
+        job.status = "completed"
+        db.session.commit()
+        notify()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(UploadJob, job_id)
+        if job.stage:
+            _set_stage(job, job.stage, "failed")
+        job.status = "failed"
+        job.error = str(e)
+        db.session.commit()
+        notify()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def create_report(email, parent=None, account_name=None):
+    new_user = False
+    if parent is not None:
+        # Account reports belong to the consolidated report's user
+        user_id = parent.user_id
+    else:
+        # Get or create user
+        user = User.query.filter_by(email=email).first()
+        new_user = user is None
+        if new_user:
+            user = User(email=email)
+            db.session.add(user)
+            db.session.flush()
+        user_id = user.id
+
+    report = Report(user_id=user_id, parent_id=parent.id if parent else None, account_name=account_name)
+    db.session.add(report)
+    db.session.flush()
+
+    if parent is None:
+        # A batch counts as one upload: its account reports aren't counted
+        stats_service.record(users=int(new_user), reports=1)
+    return report
+
+def score_report(report, transactions, rollups=None):
+    from app.services.risk_engine import compute_aggregates
+    # Calculate Score and Aggregate Data in one grouped pass
+    return apply_aggregates(report, compute_aggregates(transactions), rollups)
+
+def apply_aggregates(report, aggregates, rollups=None, distributions=None):
+    """
+    Scores `report` from its aggregates and monthly rollups (loaded when not
+    given), stores the aggregates as its running totals and snapshots its
+    percentiles (see score_distribution.snapshot for `distributions`).
+    """
+    from app.services.risk_engine import score_from_aggregates, summary_from_aggregates
+    from app.services.report_aggregates import store_aggregates, load_rollups
+    from app.services.timeseries import series_metrics
+    store_aggregates(report, aggregates)
+    if rollups is None:
+        rollups = load_rollups(report.id)
+    series = series_metrics(rollups)
+
+    summary = summary_from_aggregates(aggregates)
+    risk_data = score_from_aggregates(aggregates, series)
+
+    score_distribution.record_change(report, report.risk_score, risk_data['score'])
+    report.risk_score = risk_data['score']
+    report.percentile = score_distribution.snapshot(report, distributions)
+    report.total_income = summary.get('total_income', 0)
+    report.total_expense = summary.get('total_expenses', 0)
+
+    # Enrich summary with risk analysis
+    summary['risk_analysis'] = risk_data['analysis']
+    summary['risk_level'] = risk_data['risk_level']
+    summary['metrics'] = risk_data['metrics']
+    summary['monthly'] = series['monthly']
+
+    previous = report.summary_data or {}
+    for key in PRESERVED_SUMMARY_KEYS:
+        if key in previous:
+            summary[key] = previous[key]
+
+    report.summary_data = summary
+    return risk_data
@@ -0,0 +1,4 @@
+"""
+Benchmark suite: synthetic statements, local service stubs and the stage runner.
+Run with `python -m benchmarks.run --help`.
+"""
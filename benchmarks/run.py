@@ -0,0 +1,314 @@
+"""
+END-TO-END BENCHMARKS
+Measures each upload pipeline stage on seeded synthetic statements against
+local OpenAI/Stripe stubs and a scratch SQLite database:
+
+- parse:      iter_transaction_chunks over the CSV
+- categorize: categorize_descriptions per chunk, with a cold cache
+- persist:    TransactionWriter bulk insert (rolled back afterwards)
+- score:      calculate_risk_score + aggregate_report_data
+- render:     generate_report_pdf, rendered inline
+- upload:     POST /upload through to the completed job (upload_csv)
+
+For every stage and size it records throughput, p50/p99 latency over
+--repeat runs, and peak traced memory from one extra tracemalloc run.
+
+    python -m benchmarks.run --rows 100,10000,100000 --output benchmarks/results.json
+    python -m benchmarks.run --rows 100,10000 --compare benchmarks/baseline.json
+
+With --compare, exits non-zero if any stage's p50 is slower than the
+baseline by more than --tolerance.
+"""
+
+import os
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGES = ["parse", "categorize", "persist", "score", "render", "upload"]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default="100,10000,100000",
+                        help="Comma-separated statement sizes (default: 100,10000,100000)")
+    parser.add_argument('--stages', default=",".join(STAGES), help="Comma-separated subset of stages")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per stage and size")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--llm-latency', type=float, default=0.0, help="Seconds the OpenAI stub waits per request")
+    parser.add_argument('--output', help="Write results JSON here")
+    parser.add_argument('--compare', help="Baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p50 slowdown vs baseline (0.25 = 25%%)")
+    return parser.parse_args(argv)
+
+def _configure_environment(workdir):
+    # Scratch locations so a run never touches the real database or caches
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ['UPLOAD_SPOOL_DIR'] = os.path.join(workdir, 'spool')
+    os.environ['PDF_CACHE_DIR'] = os.path.join(workdir, 'pdfs')
+    os.environ['PDF_RENDER_WORKERS'] = '0'
+    os.environ['JOB_BACKEND'] = 'thread'
+    # Measure our code, not the production request budget
+    os.environ.setdefault('LLM_RATE_LIMIT', '1000')
+    os.environ.setdefault('LLM_BURST', '1000')
+
+# --- Measurement ----------------------------------------------------------
+
+def measure(run, rows, repeat, setup=None, teardown=None):
+    """
+    `run()` is timed `repeat` times; one extra traced run gives the peak
+    memory. `setup`/`teardown` wrap each run outside the timed region.
+    """
+    def once():
+        if setup:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        if teardown:
+            teardown()
+        return elapsed
+
+    tracemalloc.start()
+    once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = np.array([once() for _ in range(repeat)])
+    p50 = float(np.percentile(timings, 50))
+    return {
+        "rows": rows,
+        "runs": repeat,
+        "p50_ms": round(p50 * 1000, 3),
+        "p99_ms": round(float(np.percentile(timings, 99)) * 1000, 3),
+        "mean_ms": round(float(timings.mean()) * 1000, 3),
+        "throughput_rows_per_s": round(rows / p50, 1) if p50 > 0 else None,
+        "peak_memory_mb": round(peak / (1024 * 1024), 2)
+    }
+
+# --- Stages ---------------------------------------------------------------
+
+class Bench:
+    def __init__(self, app, path, rows, repeat, stubs):
+        self.app = app
+        self.path = path
+        self.rows = rows
+        self.repeat = repeat
+        self.stubs = stubs
+        self._prepare()
+
+    def _prepare(self):
+        # Inputs for the later stages, computed once outside any timing
+        import pandas as pd
+        from app.services.csv_ingest import iter_transaction_chunks
+        from app.services.ai_service import categorize_descriptions
+        from app.services.risk_engine import score_from_aggregates, summary_from_aggregates, compute_aggregates
+
+        self.chunks = [chunk[chunk['valid']].copy() for chunk in iter_transaction_chunks(self.path)]
+        for chunk in self.chunks:
+            chunk['category'] = categorize_descriptions(chunk['description'].tolist())
+        self.frame = pd.concat([chunk[['amount', 'category']] for chunk in self.chunks])
+
+        aggregates = compute_aggregates(self.frame)
+        summary = summary_from_aggregates(aggregates)
+        risk = score_from_aggregates(aggregates)
+        summary.update(risk_analysis=risk['analysis'], risk_level=risk['risk_level'], metrics=risk['metrics'])
+        self.summary = summary
+        self.risk_score = risk['score']
+
+    def parse(self):
+        from app.services.csv_ingest import iter_transaction_chunks
+
+        def run():
+            for _ in iter_transaction_chunks(self.path):
+                pass
+        return measure(run, self.rows, self.repeat)
+
+    def categorize(self):
+        from models import db, CategoryCacheEntry
+        from app.services import category_cache
+        from app.services.ai_service import categorize_descriptions
+
+        def cold_cache():
+            category_cache._memory.clear()
+            CategoryCacheEntry.query.delete()
+            db.session.commit()
+
+        def run():
+            for chunk in self.chunks:
+                categorize_descriptions(chunk['description'].tolist())
+
+        before = self.stubs["openai"].requests
+        result = measure(run, self.rows, self.repeat, setup=cold_cache)
+        result["llm_requests_per_run"] = (self.stubs["openai"].requests - before) / (self.repeat + 1)
+        return result
+
+    def persist(self):
+        from models import db, User, Report
+        from app.services.transaction_writer import TransactionWriter
+
+        def run():
+            user = User(email=f"persist-{time.time_ns()}@bench.example")
+            db.session.add(user)
+            db.session.flush()
+            report = Report(user_id=user.id)
+            db.session.add(report)
+            db.session.flush()
+            writer = TransactionWriter(report.id)
+            for chunk in self.chunks:
+                writer.write(chunk)
+            writer.flush()
+
+        return measure(run, self.rows, self.repeat, teardown=db.session.rollback)
+
+    def score(self):
+        from app.services.risk_engine import calculate_risk_score, aggregate_report_data
+
+        def run():
+            calculate_risk_score(self.frame)
+            aggregate_report_data(self.frame)
+        return measure(run, self.rows, self.repeat)
+
+    def render(self):
+        from models import Report
+        from app.services.pdf_service import generate_report_pdf
+
+        report = Report(id=1, risk_score=self.risk_score, summary_data=self.summary)
+        output = os.path.join(os.environ['PDF_CACHE_DIR'], "bench.pdf")
+        return measure(lambda: generate_report_pdf(report, None, output_path=output), self.rows, self.repeat)
+
+    def upload(self):
+        from models import db, UploadJob
+
+        client = self.app.test_client()
+
+        def run():
+            with open(self.path, 'rb') as handle:
+                response = client.post('/upload', data={"email": "bench@example.com", "file": (handle, "statement.csv")})
+            job_id = response.get_json()["job_id"]
+            while True:
+                job = db.session.get(UploadJob, job_id)
+                status, error = job.status, job.error
+                # End the read transaction so the worker can commit (SQLite)
+                db.session.rollback()
+                if status in ("completed", "failed"):
+                    break
+                time.sleep(0.002)
+            if status == "failed":
+                raise RuntimeError(f"Upload job failed: {error}")
+
+        return measure(run, self.rows, self.repeat)
+
+# --- Reporting ------------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_results(results):
+    print(f"{'rows':>9} {'stage':<11} {'p50 ms':>10} {'p99 ms':>10} {'rows/s':>12} {'peak MB':>9}")
+    for rows, stages in results.items():
+        for stage, r in stages.items():
+            throughput = f"{r['throughput_rows_per_s']:,.0f}" if r['throughput_rows_per_s'] else "-"
+            print(f"{rows:>9} {stage:<11} {r['p50_ms']:>10.2f} {r['p99_ms']:>10.2f} {throughput:>12} {r['peak_memory_mb']:>9.2f}")
+
+def compare(results, baseline, tolerance):
+    """
+    Prints p50 deltas vs the baseline; returns the number of regressions.
+    """
+    regressions = 0
+    meta = baseline.get("meta", {})
+    print(f"\nBaseline taken at commit {meta.get('commit') or 'unknown'} ({meta.get('created_at', 'unknown date')})")
+    print(f"{'rows':>9} {'stage':<11} {'base ms':>10} {'now ms':>10} {'change':>8}")
+    for rows, stages in results.items():
+        for stage, r in stages.items():
+            base = baseline.get("results", {}).get(rows, {}).get(stage)
+            if not base or not base["p50_ms"]:
+                continue
+            change = r["p50_ms"] / base["p50_ms"] - 1
+            flag = ""
+            if change > tolerance:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{rows:>9} {stage:<11} {base['p50_ms']:>10.2f} {r['p50_ms']:>10.2f} {change:>+7.0%}{flag}")
+    return regressions
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.rows.split(",")]
+    stages = [stage.strip() for stage in args.stages.split(",")]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    workdir = tempfile.mkdtemp(prefix="finhealth_bench_")
+    _configure_environment(workdir)
+
+    # Stubs first: the app reads their URLs from the environment
+    from benchmarks.stubs import start_stubs
+    from benchmarks.synthetic import write_csv
+    stubs = start_stubs(llm_latency=args.llm_latency)
+
+    from main import create_app
+    from models import db
+    app = create_app()
+
+    results = {}
+    with app.app_context():
+        db.create_all()
+        # Lets the upload stage poll its job while the worker holds the write lock
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+        for rows in sizes:
+            path = write_csv(os.path.join(workdir, f"statement_{rows}.csv"), rows, seed=args.seed)
+            bench = Bench(app, path, rows, args.repeat, stubs)
+            results[str(rows)] = {}
+            for stage in stages:
+                print(f"[{rows} rows] {stage}...", file=sys.stderr)
+                results[str(rows)][stage] = getattr(bench, stage)()
+
+    output = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "llm_latency": args.llm_latency
+        },
+        "results": results
+    }
+
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(output, handle, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            baseline = json.load(handle)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{regressions} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+IN-PROCESS SERVICE STUBS
+Small HTTP servers on background threads that stand in for OpenAI and
+Stripe, so benchmarks exercise the real client code paths (SDK, batching,
+retries, timeouts) without network access or API keys.
+
+Call start_stubs() before the app first talks to OpenAI or Stripe: both
+clients are configured from the environment when first used.
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from urllib.parse import parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from benchmarks.synthetic import CATEGORY_HINTS
+
+_NUMBERED_LINE = re.compile(r'^\s*\d+\. (.*)$', re.M)
+
+class _StubServer:
+    def __init__(self, handler):
+        self.requests = 0
+        self.latency = 0.0
+        # Checkout session id -> metadata it was created with
+        self.sessions = {}
+        stub = self
+
+        class Handler(handler):
+            server_stub = stub
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _begin(self):
+        stub = self.server_stub
+        stub.requests += 1
+        if stub.latency:
+            time.sleep(stub.latency)
+
+class _OpenAIHandler(_JSONHandler):
+    def do_POST(self):
+        self._begin()
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        prompt = body.get('messages', [{}])[0].get('content', '')
+        categories = [self._classify(line) for line in _NUMBERED_LINE.findall(prompt)]
+        self._reply(200, {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get('model', 'stub'),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": json.dumps({"categories": categories})}
+            }],
+            # Rough token counts (~4 characters per token) so usage metrics move
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(categories) * 4,
+                "total_tokens": len(prompt) // 4 + len(categories) * 4
+            }
+        })
+
+    @staticmethod
+    def _classify(description):
+        first_word = description.split(" ")[0].split("*")[0]
+        return CATEGORY_HINTS.get(first_word, "Misc")
+
+class _StripeHandler(_JSONHandler):
+    def do_GET(self):
+        self._begin()
+        session_id = self.path.split('?')[0].rstrip('/').rsplit('/', 1)[-1]
+        self._reply(200, self._session(session_id, self.server_stub.sessions.get(session_id, {})))
+
+    def do_POST(self):
+        self._begin()
+        form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode())
+        metadata = {key[len("metadata["):-1]: values[0] for key, values in form.items() if key.startswith("metadata[")}
+        session_id = f"cs_test_stub_{self.server_stub.requests}"
+        self.server_stub.sessions[session_id] = metadata
+        session = self._session(session_id, metadata, payment_status="unpaid")
+        session["url"] = f"https://checkout.stripe.test/pay/{session_id}"
+        self._reply(200, session)
+
+    @staticmethod
+    def _session(session_id, metadata, payment_status="paid"):
+        return {
+            "id": session_id,
+            "object": "checkout.session",
+            "payment_status": payment_status,
+            "payment_intent": f"pi_{session_id}",
+            "amount_total": 1900,
+            "metadata": metadata
+        }
+
+def start_openai_stub(latency=0.0):
+    stub = _StubServer(_OpenAIHandler)
+    stub.latency = latency
+    return stub
+
+def start_stripe_stub(latency=0.0):
+    stub = _StubServer(_StripeHandler)
+    stub.latency = latency
+    return stub
+
+def start_stubs(llm_latency=0.0, stripe_latency=0.0):
+    """
+    Starts both stubs and points the app's configuration at them.
+    Returns {"openai": stub, "stripe": stub}.
+    """
+    openai_stub = start_openai_stub(llm_latency)
+    stripe_stub = start_stripe_stub(stripe_latency)
+
+    os.environ['OPENAI_API_KEY'] = 'sk-stub'
+    os.environ['OPENAI_BASE_URL'] = f"{openai_stub.url}/v1"
+    os.environ['STRIPE_SECRET_KEY'] = 'sk_test_stub'
+    os.environ['STRIPE_API_BASE'] = stripe_stub.url
+
+    # The legacy module-level stripe calls use the global api_base
+    import stripe
+    stripe.api_base = stripe_stub.url
+    return {"openai": openai_stub, "stripe": stripe_stub}
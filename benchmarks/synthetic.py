@@ -0,0 +1,106 @@
+"""
+SYNTHETIC STATEMENT GENERATOR
+Seeded bank statements with realistic merchant descriptions (store numbers,
+POS prefixes, reference ids), amounts and dates, from 100 to 1M+ rows.
+
+The same seed and row count always produce the same file, so results are
+comparable between commits.
+"""
+
+import numpy as np
+import pandas as pd
+
+# (description template, category, typical amount, sign, relative frequency)
+# Templates may use {store}, {ref}, {city} and {date} placeholders.
+MERCHANTS = [
+    ("PAYROLL DIRECT DEP ACME CORP", "Income", 2600.0, 1, 2),
+    ("ADP PAYROLL {ref}", "Income", 2400.0, 1, 1),
+    ("MOBILE DEPOSIT REF {ref}", "Income", 300.0, 1, 1),
+    ("MAIN ST PROPERTY MGMT RENT", "Rent/Mortgage", 1800.0, -1, 1),
+    ("WELLS FARGO MORTGAGE MTG PMT", "Rent/Mortgage", 2100.0, -1, 1),
+    ("PG&E WEB ONLINE {ref}", "Utilities", 140.0, -1, 1),
+    ("COMCAST XFINITY {ref}", "Utilities", 90.0, -1, 1),
+    ("VERIZON WIRELESS PAYMENTS", "Utilities", 85.0, -1, 1),
+    ("WHOLE FOODS MKT #{store} {city}", "Groceries", 85.0, -1, 8),
+    ("TRADER JOE'S #{store} {city}", "Groceries", 60.0, -1, 8),
+    ("POS DEBIT {date} SAFEWAY #{store}", "Groceries", 70.0, -1, 6),
+    ("KROGER #{store}", "Groceries", 75.0, -1, 5),
+    ("COSTCO WHSE #{store}", "Groceries", 160.0, -1, 3),
+    ("STARBUCKS STORE #{store} {city}", "Dining Out", 7.5, -1, 12),
+    ("UBER EATS {ref}", "Dining Out", 32.0, -1, 6),
+    ("DOORDASH*{ref}", "Dining Out", 38.0, -1, 6),
+    ("SQ *BLUE BOTTLE COFFEE {city}", "Dining Out", 6.0, -1, 5),
+    ("CHIPOTLE {store}", "Dining Out", 14.0, -1, 5),
+    ("SHELL OIL {store} {city}", "Transport", 48.0, -1, 5),
+    ("CHEVRON {store}", "Transport", 52.0, -1, 4),
+    ("UBER TRIP {ref}", "Transport", 21.0, -1, 6),
+    ("LYFT *RIDE {date}", "Transport", 18.0, -1, 4),
+    ("CITY OF {city} PARKING", "Transport", 12.0, -1, 3),
+    ("NETFLIX.COM", "Entertainment", 15.99, -1, 1),
+    ("SPOTIFY USA", "Entertainment", 11.99, -1, 1),
+    ("STEAM GAMES {ref}", "Entertainment", 25.0, -1, 1),
+    ("AMC THEATRES #{store}", "Entertainment", 28.0, -1, 2),
+    ("CVS/PHARMACY #{store}", "Health", 24.0, -1, 3),
+    ("WALGREENS #{store}", "Health", 19.0, -1, 2),
+    ("24 HOUR FITNESS CLUB", "Health", 45.0, -1, 1),
+    ("CHASE CARD INTEREST CHARGE", "Debt/Interest", 62.0, -1, 1),
+    ("NAVIENT STUDENT LOAN PMT", "Debt/Interest", 310.0, -1, 1),
+    ("ONLINE TRANSFER TO SAVINGS {ref}", "Savings/Investment", 400.0, -1, 1),
+    ("VANGUARD BUY INVESTMENT", "Savings/Investment", 500.0, -1, 1),
+    # Merchants no keyword rule knows: these reach the LLM (stub)
+    ("AMAZON MKTPLACE PMTS {ref}", "Misc", 42.0, -1, 10),
+    ("AMZN MKTP US*{ref}", "Misc", 36.0, -1, 6),
+    ("PAYPAL *EBAY {ref}", "Misc", 55.0, -1, 3),
+    ("ETSY.COM {ref}", "Misc", 31.0, -1, 2),
+    ("HOME DEPOT #{store}", "Misc", 95.0, -1, 3),
+    ("IKEA {city}", "Misc", 140.0, -1, 1),
+    ("BEST BUY #{store}", "Misc", 180.0, -1, 1),
+    ("VENMO PAYMENT {ref}", "Misc", 40.0, -1, 3),
+]
+
+CITIES = ["SAN FRANCISCO", "OAKLAND", "AUSTIN", "SEATTLE", "DENVER", "BROOKLYN", "CHICAGO", "PORTLAND"]
+
+# Keyword -> category, for stubs that need to answer like a classifier would
+CATEGORY_HINTS = {template.split(" ")[0].split("*")[0]: category for template, category, _, _, _ in MERCHANTS}
+
+def generate_transactions(rows, seed=42, start="2024-01-01", days=365, messy_fraction=0.01):
+    """
+    Returns a DataFrame with raw-string `Date`, `Description` and `Amount`
+    columns, the way a bank export looks. `messy_fraction` of the rows use
+    alternative formats ("$1,234.56", "01/31/2024") to exercise the parsers.
+    """
+    rng = np.random.default_rng(seed)
+    weights = np.array([m[4] for m in MERCHANTS], dtype=float)
+    picks = rng.choice(len(MERCHANTS), size=rows, p=weights / weights.sum())
+
+    typical = np.array([m[2] for m in MERCHANTS])[picks]
+    signs = np.array([m[3] for m in MERCHANTS])[picks]
+    amounts = np.round(typical * rng.lognormal(0.0, 0.35, size=rows), 2) * signs
+
+    base = np.datetime64(start)
+    dates = np.sort(base + rng.integers(0, days, size=rows).astype('timedelta64[D]'))
+    date_strings = pd.Series(dates).dt.strftime('%Y-%m-%d')
+
+    stores = rng.integers(100, 9999, size=rows)
+    refs = rng.integers(10**9, 10**10, size=rows)
+    cities = rng.integers(0, len(CITIES), size=rows)
+    descriptions = [
+        MERCHANTS[p][0].format(store=s, ref=r, city=CITIES[c], date=d[5:].replace('-', '/'))
+        for p, s, r, c, d in zip(picks.tolist(), stores.tolist(), refs.tolist(), cities.tolist(), date_strings.tolist())
+    ]
+
+    amount_strings = pd.Series(amounts).map('{:.2f}'.format)
+    messy = rng.random(rows) < messy_fraction
+    if messy.any():
+        amount_strings[messy] = pd.Series(amounts[messy]).map('${:,.2f}'.format).values
+        date_strings[messy] = pd.Series(dates[messy]).dt.strftime('%m/%d/%Y').values
+
+    return pd.DataFrame({
+        "Date": date_strings,
+        "Description": descriptions,
+        "Amount": amount_strings
+    })
+
+def write_csv(path, rows, seed=42, **kwargs):
+    generate_transactions(rows, seed=seed, **kwargs).to_csv(path, index=False)
+    return path
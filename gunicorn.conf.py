@@ -0,0 +1,44 @@
+"""
+GUNICORN CONFIGURATION
+Routes import pandas, reportlab, openai and stripe lazily, so a worker boots
+in a fraction of a second. With GUNICORN_PRELOAD (the default), the master
+loads the app and runs main.warm_up() once before forking. Workers then
+start with the heavy modules already imported and share those pages
+copy-on-write, instead of each importing them on its first upload or
+download.
+
+Workers are threaded (gthread): a status stream (the report and upload
+/events SSE endpoints) holds its thread for up to STATUS_STREAM_TIMEOUT
+and EventSource reconnects straight away, so with sync workers a couple of
+open report pages would occupy every worker. Each worker serves
+GUNICORN_THREADS requests and streams at once; streams release their
+database connection while they wait, so the threads don't need a pooled
+connection each.
+
+    gunicorn -c gunicorn.conf.py "main:create_app()"
+
+Run scripts/measure_startup.py to compare boot time and per-worker memory.
+"""
+
+import os
+
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork
+    if preload_app:
+        from main import warm_up
+        warm_up()
+        server.log.info("Heavy modules preloaded; forking workers")
+
+def post_fork(server, worker):
+    if preload_app:
+        # Never share pooled DB connections across processes (the replica's
+        # pool included)
+        from models import db
+        with server.app.wsgi().app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask, render_template
 from dotenv import load_dotenv
 from models import db
@@ -6,6 +7,21 @@ from flask_migrate import Migrate
 
 load_dotenv()
 
+def warm_up():
+    """
+    Imports the heavy libraries and builds shared read-only state. Routes
+    load these lazily; gunicorn's preload mode calls this once in the master
+    so forked workers share the pages copy-on-write instead of each paying
+    the import. No connections or threads are created here.
+    """
+    import pandas
+    import numpy
+    import openai
+    from app.services import ai_service, csv_ingest, risk_engine, transaction_writer, rule_categorizer
+    from app.services import pdf_service, pdf_cache, stripe_service, stripe_verifier
+    pdf_service.get_styles()
+    stripe_service.get_stripe()
+
 def create_app():
     app = Flask(__name__)
     
@@ -14,20 +30,66 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///database.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Engine tuning per database (SQLite WAL, PostgreSQL pooling) and the
+    # optional read replica
+    from app.services import db_profiles
+    db_profiles.configure(app)
+
     # Initialize extensions
     db.init_app(app)
+    db_profiles.attach(app, db)
     Migrate(app, db)
 
+    # Request timing, SQL counts and slow-request logging
+    from app.services import metrics
+    metrics.init_app(app)
+
     # Register Blueprints
     from app.routes.upload import upload_bp
     from app.routes.payment import payment_bp
     from app.routes.report import report_bp
     from app.routes.admin import admin_bp
+    from app.routes.jobs import jobs_bp
+    from app.routes.metrics import metrics_bp
 
     app.register_blueprint(upload_bp)
     app.register_blueprint(payment_bp)
     app.register_blueprint(report_bp)
     app.register_blueprint(admin_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(metrics_bp)
+
+    @app.cli.command('rescore-reports')
+    @click.option('--batch-size', default=500, help='Reports scored per grouped reduction.')
+    def rescore_reports_command(batch_size):
+        """Re-scores every report with the current risk formula."""
+        from app.services.rescore import rescore_reports
+        click.echo(f"Re-scored {rescore_reports(batch_size)} reports")
+
+    @app.cli.command('prune-category-cache')
+    def prune_category_cache_command():
+        """Deletes categorization cache entries older than CATEGORY_CACHE_TTL."""
+        from app.services.category_cache import prune_expired
+        click.echo(f"Removed {prune_expired()} expired cache entries")
+
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Recomputes the materialized admin stats from the source tables."""
+        from app.services.stats_service import rebuild_stats
+        rebuild_stats()
+        click.echo("Admin stats rebuilt")
+
+    @app.cli.command('rebuild-score-distribution')
+    def rebuild_score_distribution_command():
+        """Recomputes the population score histograms and fills missing percentile snapshots."""
+        from app.services.score_distribution import rebuild_distribution
+        click.echo(f"Score distribution rebuilt from {rebuild_distribution()} reports")
+
+    @app.cli.command('process-stripe-events')
+    def process_stripe_events_command():
+        """Applies pending Stripe webhook events (also a sweeper for missed runs)."""
+        from app.services.stripe_events import process_pending_events
+        click.echo(f"Processed {process_pending_events()} Stripe events")
 
     @app.route('/')
     def index():
@@ -37,9 +99,9 @@ def create_app():
     def report_page(report_id):
         return render_template('report.html')
 
-    @app.route('/processing/<int:report_id>')
-    def processing_page(report_id):
-        return render_template('processing.html', report_id=report_id)
+    @app.route('/processing/<job_id>')
+    def processing_page(job_id):
+        return render_template('processing.html', job_id=job_id)
 
     @app.route('/admin/dashboard')
     def admin_dashboard_page():
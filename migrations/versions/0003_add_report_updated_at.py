@@ -0,0 +1,29 @@
+"""add report updated_at
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 23:58:40.112734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing reports have not changed since they were created
+    op.execute("UPDATE report SET updated_at = created_at")
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,53 @@
+"""stripe event inbox
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 23:18:25.042990
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stripe_event',
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('received_at', sa.DateTime(), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stripe_event', schema=None) as batch_op:
+        batch_op.create_index('ix_stripe_event_status_received_at', ['status', 'received_at'], unique=False)
+
+    # Duplicate deliveries could record one charge more than once; keep the
+    # first row so the unique constraint can be created. Run
+    # `flask rebuild-stats` afterwards to correct the revenue totals.
+    op.execute(
+        "DELETE FROM payment WHERE stripe_payment_intent_id IS NOT NULL AND id NOT IN ("
+        "SELECT MIN(id) FROM payment WHERE stripe_payment_intent_id IS NOT NULL "
+        "GROUP BY stripe_payment_intent_id)"
+    )
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_payment_stripe_payment_intent_id', ['stripe_payment_intent_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('payment', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_payment_stripe_payment_intent_id', type_='unique')
+
+    with op.batch_alter_table('stripe_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_stripe_event_status_received_at')
+
+    op.drop_table('stripe_event')
@@ -0,0 +1,38 @@
+"""batch upload accounts
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 00:41:12.508316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('parent_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('account_name', sa.String(length=255), nullable=True))
+        batch_op.create_index(batch_op.f('ix_report_parent_id'), ['parent_id'], unique=False)
+        batch_op.create_foreign_key('fk_report_parent_id_report', 'report', ['parent_id'], ['id'])
+
+    with op.batch_alter_table('upload_job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('accounts', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('upload_job', schema=None) as batch_op:
+        batch_op.drop_column('accounts')
+
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_report_parent_id_report', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_report_parent_id'))
+        batch_op.drop_column('account_name')
+        batch_op.drop_column('parent_id')
@@ -0,0 +1,43 @@
+"""report running aggregates
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 01:27:53.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Left empty for existing reports: the first append (or `flask rescore-reports`)
+    # builds a report's row from its transactions
+    op.create_table('report_aggregate',
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('income_total', sa.Float(), nullable=False),
+    sa.Column('expense_total', sa.Float(), nullable=False),
+    sa.Column('income_count', sa.Integer(), nullable=False),
+    sa.Column('debt', sa.Float(), nullable=False),
+    sa.Column('essentials', sa.Float(), nullable=False),
+    sa.Column('discretionary', sa.Float(), nullable=False),
+    sa.Column('category_breakdown', sa.JSON(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['report.id'], ),
+    sa.PrimaryKeyConstraint('report_id')
+    )
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_report_id_date', ['report_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.drop_index('ix_transaction_report_id_date')
+
+    op.drop_table('report_aggregate')
@@ -0,0 +1,30 @@
+"""score histogram
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 02:05:37.881452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by `flask rebuild-score-distribution` after upgrading
+    op.create_table('score_histogram',
+    sa.Column('scope', sa.String(length=20), nullable=False),
+    sa.Column('bucket', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('scope', 'bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('score_histogram')
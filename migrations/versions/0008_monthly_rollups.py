@@ -0,0 +1,34 @@
+"""monthly rollups
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 02:48:19.640275
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Backfilled from existing transactions by `flask rescore-reports`
+    op.create_table('monthly_rollup',
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Date(), nullable=False),
+    sa.Column('income_total', sa.Float(), nullable=False),
+    sa.Column('expense_total', sa.Float(), nullable=False),
+    sa.Column('income_count', sa.Integer(), nullable=False),
+    sa.Column('category_breakdown', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['report_id'], ['report.id'], ),
+    sa.PrimaryKeyConstraint('report_id', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('monthly_rollup')
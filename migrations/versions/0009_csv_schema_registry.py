@@ -0,0 +1,30 @@
+"""csv schema registry
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 05:12:40.118392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('csv_schema_entry',
+    sa.Column('signature', sa.String(length=40), nullable=False),
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('spec', sa.JSON(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('signature')
+    )
+
+
+def downgrade():
+    op.drop_table('csv_schema_entry')
@@ -0,0 +1,27 @@
+"""report percentile snapshot
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:17:51.957766
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled for existing reports by `flask rebuild-score-distribution`
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('percentile', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_column('percentile')
@@ -0,0 +1,26 @@
+"""report append version
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:31:06.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,29 @@
+"""transaction dedupe index
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 01:02:44.581930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Append dedupe seeks (date, amount) pairs; the old index is its prefix
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_report_id_date_amount', ['report_id', 'date', 'amount'], unique=False)
+        batch_op.drop_index('ix_transaction_report_id_date')
+
+
+def downgrade():
+    with op.batch_alter_table('transaction', schema=None) as batch_op:
+        batch_op.create_index('ix_transaction_report_id_date', ['report_id', 'date'], unique=False)
+        batch_op.drop_index('ix_transaction_report_id_date_amount')
@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from app.services.db_profiles import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,31 +11,146 @@ class User(db.Model):
     reports = db.relationship('Report', backref='user', lazy=True)
 
 class Report(db.Model):
+    __table_args__ = (
+        # Admin listing: ORDER BY created_at DESC, id DESC with keyset seeks
+        db.Index('ix_report_created_at_id', 'created_at', 'id'),
+        # Paid filter on the admin listing and paid-report counts
+        db.Index('ix_report_paid_created_at_id', 'paid', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     risk_score = db.Column(db.Integer)
     total_income = db.Column(db.Float, default=0.0)
     total_expense = db.Column(db.Float, default=0.0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped on every change; drives the ETag / Last-Modified of get_report
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     paid = db.Column(db.Boolean, default=False)
+    # Bumped by every append; an append commits only over the version it read
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Batch uploads: one report per account under a consolidated parent
+    parent_id = db.Column(db.Integer, db.ForeignKey('report.id'), index=True)
+    account_name = db.Column(db.String(255))
+    accounts = db.relationship('Report', backref=db.backref('parent', remote_side=[id]), lazy=True)
     
     # SaaS Extensions (Stripe integration)
-    stripe_session_id = db.Column(db.String(255))
+    stripe_session_id = db.Column(db.String(255), index=True)
     summary_data = db.Column(db.JSON) 
+    # Population rank as of scoring (refreshed on payment); printed on the PDF
+    percentile = db.Column(db.JSON)
     transactions = db.relationship('Transaction', backref='report', lazy=True)
+    aggregate = db.relationship('ReportAggregate', backref='report', uselist=False, lazy=True)
+
+class ReportAggregate(db.Model):
+    # Running totals behind a report's score: appends fold in only the new rows
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), primary_key=True)
+    income_total = db.Column(db.Float, default=0.0, nullable=False)
+    expense_total = db.Column(db.Float, default=0.0, nullable=False)
+    income_count = db.Column(db.Integer, default=0, nullable=False)
+    debt = db.Column(db.Float, default=0.0, nullable=False)
+    essentials = db.Column(db.Float, default=0.0, nullable=False)
+    discretionary = db.Column(db.Float, default=0.0, nullable=False)
+    category_breakdown = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class MonthlyRollup(db.Model):
+    # Per-report, per-calendar-month totals behind the time-series metrics
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True) # first day of the month
+    income_total = db.Column(db.Float, default=0.0, nullable=False)
+    expense_total = db.Column(db.Float, default=0.0, nullable=False)
+    income_count = db.Column(db.Integer, default=0, nullable=False)
+    category_breakdown = db.Column(db.JSON, nullable=False)
 
 class Transaction(db.Model):
+    __table_args__ = (
+        # Append-mode dedupe looks up a report's rows by (date, amount)
+        db.Index('ix_transaction_report_id_date_amount', 'report_id', 'date', 'amount'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=False)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=False, index=True)
     date = db.Column(db.Date, nullable=False)
     description = db.Column(db.String(255), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     category = db.Column(db.String(100))
 
 class Payment(db.Model):
+    __table_args__ = (
+        # A replayed webhook can never record the same charge twice
+        db.UniqueConstraint('stripe_payment_intent_id', name='uq_payment_stripe_payment_intent_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=False)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=False, index=True)
     stripe_payment_intent_id = db.Column(db.String(255))
     amount = db.Column(db.Float)
     status = db.Column(db.String(50))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StripeEvent(db.Model):
+    # Webhook inbox: one row per Stripe event id, applied by a background consumer
+    __table_args__ = (
+        db.Index('ix_stripe_event_status_received_at', 'status', 'received_at'),
+    )
+
+    id = db.Column(db.String(255), primary_key=True)
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="pending")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+
+class UploadJob(db.Model):
+    id = db.Column(db.String(36), primary_key=True)
+    email = db.Column(db.String(120), nullable=False)
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), default='queued') # queued, running, completed, failed
+    stage = db.Column(db.String(20))
+    stages = db.Column(db.JSON)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'))
+    rows_saved = db.Column(db.Integer)
+    rejected_rows = db.Column(db.JSON)
+    # Batch uploads: per-file account name, report, rows and errors
+    accounts = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CategoryCacheEntry(db.Model):
+    # Normalized merchant description -> category learned from the LLM
+    key = db.Column(db.String(255), primary_key=True)
+    category = db.Column(db.String(100), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CsvSchemaEntry(db.Model):
+    # Header signature -> column mapping resolved by csv_schemas
+    signature = db.Column(db.String(40), primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    spec = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class StatsTotals(db.Model):
+    # Single materialized row (id=1) kept up to date by stats_service
+    id = db.Column(db.Integer, primary_key=True)
+    users = db.Column(db.Integer, default=0, nullable=False)
+    reports = db.Column(db.Integer, default=0, nullable=False)
+    paid_reports = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0.0, nullable=False)
+
+class ScoreHistogram(db.Model):
+    # Reports per risk score (0-100) in a population scope, kept by score_distribution;
+    # the ("version", 0) row counts changes
+    scope = db.Column(db.String(20), primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+class DailyStats(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    users = db.Column(db.Integer, default=0, nullable=False)
+    reports = db.Column(db.Integer, default=0, nullable=False)
+    paid_reports = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0.0, nullable=False)
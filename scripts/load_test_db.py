@@ -0,0 +1,191 @@
+"""
+DATABASE CONCURRENCY LOAD TEST
+Runs --workers processes against one scratch database, the way gunicorn
+workers and upload jobs share it, and reports write throughput and lock
+errors for each engine profile:
+
+- writers: upload-shaped transactions (a user, a report, --rows
+  transactions through TransactionWriter, the stats counters) committed
+  back to back
+- readers: the report status/detail reads served by get_report
+
+Each profile gets a fresh database, so the SQLite runs compare the default
+rollback journal (DB_PROFILE=none) with the tuned WAL profile.
+
+    python scripts/load_test_db.py
+    python scripts/load_test_db.py --workers 16 --readers 4 --duration 20 --profiles none,sqlite
+    DATABASE_URL=postgresql://... python scripts/load_test_db.py --profiles postgresql
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=8, help="Writer processes")
+    parser.add_argument('--readers', type=int, default=2, help="Reader processes")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per profile")
+    parser.add_argument('--warmup', type=float, default=8.0, help="Seconds allowed for the processes to boot")
+    parser.add_argument('--rows', type=int, default=200, help="Transactions written per upload")
+    parser.add_argument('--profiles', default="none,sqlite", help="Comma-separated DB_PROFILE values")
+    parser.add_argument('--json', help="Write results JSON here")
+    return parser.parse_args(argv)
+
+def _app(database_url, profile):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['DB_PROFILE'] = profile
+    from main import create_app
+    return create_app()
+
+def _is_lock_error(error):
+    text = str(error).lower()
+    return "database is locked" in text or "database is busy" in text
+
+def writer(database_url, profile, start_at, deadline, rows, results):
+    import pandas as pd
+    from sqlalchemy.exc import OperationalError
+    from models import db, User, Report
+    from app.services import stats_service
+    from app.services.transaction_writer import TransactionWriter
+
+    app = _app(database_url, profile)
+    frame = pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=rows, freq='h'),
+        'description': [f"MERCHANT {i % 50}" for i in range(rows)],
+        'amount': [-12.5 if i % 10 else 2500.0 for i in range(rows)],
+        'category': ["Misc" if i % 10 else "Income" for i in range(rows)]
+    })
+    latencies, locked, errors = [], 0, 0
+    time.sleep(max(0.0, start_at - time.time()))
+    with app.app_context():
+        while time.time() < deadline:
+            start = time.perf_counter()
+            try:
+                user = User(email=f"load-{os.getpid()}-{time.time_ns()}@example.com")
+                db.session.add(user)
+                db.session.flush()
+                report = Report(user_id=user.id, risk_score=60, summary_data={"total_income": 0})
+                db.session.add(report)
+                db.session.flush()
+                writer = TransactionWriter(report.id)
+                writer.write(frame)
+                writer.flush()
+                stats_service.record(users=1, reports=1)
+                db.session.commit()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError as e:
+                db.session.rollback()
+                if _is_lock_error(e):
+                    locked += 1
+                else:
+                    errors += 1
+    results.put({"role": "writer", "commits": len(latencies), "latencies": latencies,
+                 "locked": locked, "errors": errors})
+
+def reader(database_url, profile, start_at, deadline, results):
+    from sqlalchemy import select, func
+    from sqlalchemy.exc import OperationalError
+    from models import db, Report
+
+    app = _app(database_url, profile)
+    reads, locked = 0, 0
+    time.sleep(max(0.0, start_at - time.time()))
+    with app.app_context():
+        while time.time() < deadline:
+            try:
+                last = db.session.execute(select(func.max(Report.id))).scalar() or 1
+                report = db.session.get(Report, last)
+                if report is not None:
+                    report.summary_data
+                db.session.rollback()
+                reads += 1
+            except OperationalError as e:
+                db.session.rollback()
+                if not _is_lock_error(e):
+                    raise
+                locked += 1
+    results.put({"role": "reader", "reads": reads, "locked": locked})
+
+def _create_schema(database_url, profile):
+    app = _app(database_url, profile)
+    from models import db
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+def run_profile(profile, args):
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url or database_url.startswith('sqlite'):
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='finhealth_load_'), 'load.db')}"
+
+    context = multiprocessing.get_context('spawn')
+    schema = context.Process(target=_create_schema, args=(database_url, profile))
+    schema.start()
+    schema.join()
+
+    results = context.Queue()
+    # Every process boots first, then they all start together
+    start_at = time.time() + args.warmup
+    deadline = start_at + args.duration
+    processes = [context.Process(target=writer, args=(database_url, profile, start_at, deadline, args.rows, results))
+                 for _ in range(args.workers)]
+    processes += [context.Process(target=reader, args=(database_url, profile, start_at, deadline, results))
+                  for _ in range(args.readers)]
+    for process in processes:
+        process.start()
+    outcomes = []
+    while len(outcomes) < len(processes):
+        try:
+            outcomes.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                raise SystemExit(f"[{profile}] a worker process crashed")
+    for process in processes:
+        process.join()
+
+    writers = [o for o in outcomes if o["role"] == "writer"]
+    readers = [o for o in outcomes if o["role"] == "reader"]
+    latencies = sorted(l for o in writers for l in o["latencies"])
+    commits = sum(o["commits"] for o in writers)
+    elapsed = args.duration
+    return {
+        "profile": profile,
+        "workers": args.workers,
+        "readers": args.readers,
+        "uploads_per_s": round(commits / elapsed, 1),
+        "rows_per_s": round(commits * args.rows / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 1) if latencies else None,
+        "locked_errors": sum(o["locked"] for o in writers) + sum(o["locked"] for o in readers),
+        "other_errors": sum(o["errors"] for o in writers),
+        "reads_per_s": round(sum(o["reads"] for o in readers) / elapsed, 1)
+    }
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = []
+    for profile in [p.strip() for p in args.profiles.split(",")]:
+        print(f"[{profile}] {args.workers} writers, {args.readers} readers, {args.duration:.0f}s...", file=sys.stderr)
+        results.append(run_profile(profile, args))
+
+    print(f"{'profile':<11} {'uploads/s':>10} {'rows/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'locked':>7} {'reads/s':>9}")
+    for r in results:
+        print(f"{r['profile']:<11} {r['uploads_per_s']:>10.1f} {r['rows_per_s']:>10.0f} {r['p50_ms'] or 0:>8.1f} "
+              f"{r['p99_ms'] or 0:>8.1f} {r['locked_errors']:>7} {r['reads_per_s']:>9.1f}")
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
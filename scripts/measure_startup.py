@@ -0,0 +1,176 @@
+"""
+STARTUP MEASUREMENT
+Measures what a fresh worker pays before serving its first request:
+
+1. Cold start: `create_app()` in a fresh interpreter, repeated --runs times.
+   Reports wall time, RSS, and which heavy libraries got imported.
+2. Gunicorn: boots --workers workers with and without preload_app and
+   reports time-to-ready and per-worker memory. Memory is read from
+   /proc/<pid>/smaps_rollup (Linux only): RSS, PSS and private (USS) bytes.
+   USS is what each extra worker really costs.
+
+    python scripts/measure_startup.py
+    python scripts/measure_startup.py --runs 10 --workers 4 --json startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "reportlab", "openai", "stripe"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+from main import create_app
+app = create_app()
+elapsed = time.perf_counter() - start
+rss_kb = 0
+with open('/proc/self/status') as status:
+    for line in status:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    "seconds": elapsed,
+    "rss_mb": rss_kb / 1024,
+    "heavy_modules": [m for m in %r if m in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+SCHEMA = """
+from main import create_app
+from models import db
+app = create_app()
+with app.app_context():
+    db.create_all()
+"""
+
+_scratch_db = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault('DATABASE_URL', _scratch_db)
+    env['PYTHONPATH'] = ROOT + os.pathsep + env.get('PYTHONPATH', '')
+    return env
+
+def cold_start(runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=_env(),
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    seconds = [s["seconds"] for s in samples]
+    return {
+        "runs": runs,
+        "create_app_p50_ms": round(statistics.median(seconds) * 1000, 1),
+        "create_app_max_ms": round(max(seconds) * 1000, 1),
+        "rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+        "heavy_modules_loaded": samples[-1]["heavy_modules"]
+    }
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _children(pid):
+    children = []
+    task_dir = f"/proc/{pid}/task"
+    for tid in os.listdir(task_dir):
+        with open(f"{task_dir}/{tid}/children") as handle:
+            children += [int(c) for c in handle.read().split()]
+    return children
+
+def _memory(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        "rss_mb": values.get("Rss", 0) / 1024,
+        "pss_mb": values.get("Pss", 0) / 1024,
+        "uss_mb": (values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)) / 1024
+    }
+
+def gunicorn(workers, preload, warm_request):
+    port = _free_port()
+    env = _env()
+    env['GUNICORN_PRELOAD'] = 'true' if preload else 'false'
+    env['WEB_CONCURRENCY'] = str(workers)
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+               '-b', f'127.0.0.1:{port}', 'main:create_app()']
+
+    start = time.perf_counter()
+    master = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Ready = the port answers and every worker has forked
+        while True:
+            if master.poll() is not None:
+                raise RuntimeError("gunicorn exited during startup")
+            try:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=1).read()
+                if len(_children(master.pid)) >= workers:
+                    break
+            except OSError:
+                pass
+            time.sleep(0.02)
+        ready = time.perf_counter() - start
+
+        if warm_request:
+            # Exercise a route that needs the heavy libraries in every worker
+            for _ in range(workers * 4):
+                urllib.request.urlopen(f"http://127.0.0.1:{port}{warm_request}", timeout=30).read()
+        time.sleep(0.5)
+
+        per_worker = [_memory(pid) for pid in _children(master.pid)]
+        return {
+            "workers": workers,
+            "preload": preload,
+            "ready_seconds": round(ready, 2),
+            "per_worker_rss_mb": round(statistics.mean(m["rss_mb"] for m in per_worker), 1),
+            "per_worker_pss_mb": round(statistics.mean(m["pss_mb"] for m in per_worker), 1),
+            "per_worker_uss_mb": round(statistics.mean(m["uss_mb"] for m in per_worker), 1),
+            "master_rss_mb": round(_memory(master.pid)["rss_mb"], 1)
+        }
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--warm-request', default=None,
+                        help="Path requested in each worker before measuring memory (e.g. /admin/stats)")
+    parser.add_argument('--skip-gunicorn', action='store_true')
+    parser.add_argument('--json', help="Write results here")
+    args = parser.parse_args(argv)
+
+    results = {"cold_start": cold_start(args.runs)}
+    print("cold start:", json.dumps(results["cold_start"]))
+
+    if not args.skip_gunicorn:
+        subprocess.run([sys.executable, '-c', SCHEMA], cwd=ROOT, env=_env(), check=True)
+        results["gunicorn"] = []
+        for preload in (False, True):
+            result = gunicorn(args.workers, preload, args.warm_request)
+            results["gunicorn"].append(result)
+            print("gunicorn:  ", json.dumps(result))
+
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(results, handle, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())